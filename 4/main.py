@@ -2,19 +2,107 @@ import re
 import csv
 import os
 import random
-from collections import defaultdict, deque
-from typing import Set, Dict, List, Optional, Tuple, Any
+from array import array
+from functools import lru_cache
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+from typing import Set, Dict, List, Optional, Tuple, Any, Iterator, Iterable
+
+OPERATORS = frozenset('|*().+')
+PRECEDENCE = {'|': 1, '.': 2, '*': 3, '+': 3}
+
+# Позиция, где нужна явная конкатенация: слева символ, который может завершать
+# операнд (не |, ( и .), справа - символ, который может его начинать (не |, ), *, + и .)
+_CONCAT_RE = re.compile(r'(?<=[^|(.])(?=[^|)*+.])')
+
+# Приоритеты операторов, индексируемые кодом символа; у '(' приоритет 0,
+# поэтому выталкивание из стека на ней останавливается без отдельной проверки
+_PRIORITY = bytearray(128)
+for _op, _priority in PRECEDENCE.items():
+    _PRIORITY[ord(_op)] = _priority
+
+
+@lru_cache(maxsize=4096)
+def _add_concat_operator(regex: str) -> str:
+    """Добавление оператора конкатенации (.) в явном виде"""
+    # Вставляем . между:
+    # 1) символом и символом
+    # 2) символом и (
+    # 3) ) и символом
+    # 4) ) и (
+    # 5) * и символом
+    # 6) * и (
+    # 7) + и символом
+    # 8) + и (
+    return _CONCAT_RE.sub('.', regex)
+
+
+@lru_cache(maxsize=4096)
+def _to_postfix(regex: str) -> str:
+    """Преобразование регулярного выражения в обратную польскую запись"""
+    if not regex:
+        return ''
+
+    # Добавляем оператор конкатенации
+    regex = _add_concat_operator(regex)
+
+    priority = _PRIORITY
+    output = []
+    append = output.append
+    stack = []
+
+    chars = iter(regex)
+    for char in chars:
+        if char == '\\':  # Обработка экранирования
+            escaped = next(chars, None)
+            if escaped is not None:
+                append(char + escaped)
+            continue
+
+        if char not in OPERATORS:
+            append(char)
+        elif char == '(':
+            stack.append(char)
+        elif char == ')':
+            while stack and stack[-1] != '(':
+                append(stack.pop())
+            if stack:
+                stack.pop()  # Удаляем '('
+            else:
+                raise ValueError("Несогласованные скобки в регулярном выражении")
+        else:
+            char_priority = priority[ord(char)]
+            while stack and priority[ord(stack[-1])] >= char_priority:
+                append(stack.pop())
+            stack.append(char)
+
+    # Обработка оставшихся операторов в стеке
+    while stack:
+        if stack[-1] == '(':
+            raise ValueError("Несогласованные скобки в регулярном выражении")
+        append(stack.pop())
+
+    return ''.join(output)
+
+
+@lru_cache(maxsize=1024)
+def _compile_py(pattern: str):
+    """Компиляция выражения модулем re (с кэшированием)"""
+    return re.compile(pattern)
 
 
 class State:
     """Класс для представления состояния автомата"""
+    __slots__ = ('id', 'transitions', 'epsilon_transitions', 'is_final')
     counter = 0
 
     def __init__(self, is_final: bool = False):
         self.id = State.counter
         State.counter += 1
         self.transitions = defaultdict(set)  # символ -> множество состояний
-        self.epsilon_transitions = set()  # ε-переходы
+        self.epsilon_transitions = []  # ε-переходы (без повторов)
         self.is_final = is_final
 
     def add_transition(self, symbol: str, state):
@@ -23,16 +111,21 @@ class State:
 
     def add_epsilon(self, state):
         """Добавить ε-переход"""
-        self.epsilon_transitions.add(state)
+        # ε-переходов у состояния Томпсона не больше двух, поэтому
+        # проверка по списку дешевле, чем хранение множества
+        if state not in self.epsilon_transitions:
+            self.epsilon_transitions.append(state)
 
     def __repr__(self):
         return f"State({self.id}, final={self.is_final})"
 
     def __hash__(self):
-        return hash(self.id)
+        # ID - неотрицательное целое, и hash(id) == id, поэтому
+        # возвращаем его напрямую без лишнего вызова hash()
+        return self.id
 
     def __eq__(self, other):
-        return isinstance(other, State) and self.id == other.id
+        return self is other or (isinstance(other, State) and self.id == other.id)
 
 
 class NFA:
@@ -41,41 +134,140 @@ class NFA:
     def __init__(self, start: State = None, end: State = None):
         self.start = start
         self.end = end
-
-    def epsilon_closure(self, states: Set[State]) -> Set[State]:
-        """Вычисление ε-замыкания множества состояний"""
-        closure = set(states)
-        stack = list(states)
+        # Состояния нумеруются локально 0..n-1 (при первом ε-замыкании), поэтому
+        # размер таблиц зависит от размера этого НКА, а не от State.counter
+        self._index = None  # Состояние -> номер
+        self._by_index = None  # Номер -> состояние
+        self._eps_adj = None  # Номер -> список номеров ε-соседей
+        self._visited = None  # Массив посещений, переиспользуемый между вызовами
+        # Переходы по символам в сжатом построчном виде (CSR): переходы
+        # состояния с номером sid лежат в срезе [offsets[sid], offsets[sid + 1])
+        self._offsets = None
+        self._symbols = None
+        self._targets = None
+        self._lazy_dfa = None  # Кэш переходов для process_input
+
+    def states(self) -> List[State]:
+        """Все состояния НКА, достижимые из начального"""
+        visited = {self.start}
+        stack = [self.start]
 
         while stack:
             state = stack.pop()
-            for next_state in state.epsilon_transitions:
-                if next_state not in closure:
-                    closure.add(next_state)
-                    stack.append(next_state)
+            for targets in state.transitions.values():
+                for target in targets:
+                    if target not in visited:
+                        visited.add(target)
+                        stack.append(target)
+            for target in state.epsilon_transitions:
+                if target not in visited:
+                    visited.add(target)
+                    stack.append(target)
 
-        return closure
+        return list(visited)
 
-    def process_input(self, input_string: str) -> bool:
-        """Обработка входной строки НКА"""
-        current_states = self.epsilon_closure({self.start})
+    def symbols(self) -> Set[str]:
+        """Все символы, по которым в НКА есть переходы"""
+        alphabet = set()
+        for state in self.states():
+            alphabet.update(state.transitions)
+        return alphabet
 
-        for symbol in input_string:
-            next_states = set()
-            for state in current_states:
-                if symbol in state.transitions:
-                    next_states.update(state.transitions[symbol])
+    def _build_index(self):
+        """Построение целочисленных таблиц НКА: номера состояний, ε-смежность, переходы"""
+        self._by_index = states = self.states()
+        self._index = index = {state: i for i, state in enumerate(states)}
+
+        self._eps_adj = [[index[target] for target in state.epsilon_transitions]
+                         for state in states]
+        self._visited = bytearray(len(states))
+
+        offsets = array('i', [0]) * (len(states) + 1)
+        symbols = []
+        targets = array('i')
+        for sid, state in enumerate(states):
+            for symbol in sorted(state.transitions):
+                for target in state.transitions[symbol]:
+                    symbols.append(symbol)
+                    targets.append(index[target])
+            offsets[sid + 1] = len(targets)
+
+        self._offsets = offsets
+        self._symbols = symbols
+        self._targets = targets
+
+    def index(self) -> Dict[State, int]:
+        """Локальные номера состояний НКА (0..n-1)"""
+        if self._index is None:
+            self._build_index()
+        return self._index
+
+    def moves(self, ids: Iterable[int]) -> Dict[str, List[int]]:
+        """Переходы из множества состояний (по номерам), сгруппированные по символу"""
+        if self._offsets is None:
+            self._build_index()
+
+        offsets = self._offsets
+        symbols = self._symbols
+        targets = self._targets
+        result = {}
+
+        for sid in ids:
+            for k in range(offsets[sid], offsets[sid + 1]):
+                symbol = symbols[k]
+                if symbol in result:
+                    result[symbol].append(targets[k])
+                else:
+                    result[symbol] = [targets[k]]
 
-            if not next_states:
-                return False
+        return result
+
+    def epsilon_closure_ids(self, ids: Iterable[int]) -> List[int]:
+        """ε-замыкание множества состояний, заданных своими номерами"""
+        if self._eps_adj is None:
+            self._build_index()
+
+        eps_adj = self._eps_adj
+        visited = self._visited
+        stack = list(ids)
+        closure = []
+
+        while stack:
+            sid = stack.pop()
+            if visited[sid]:
+                continue
+            visited[sid] = 1
+            closure.append(sid)
+            stack.extend(eps_adj[sid])
+
+        # Сбрасываем только затронутые ячейки, а не весь массив
+        for sid in closure:
+            visited[sid] = 0
+
+        return closure
 
-            current_states = self.epsilon_closure(next_states)
+    def epsilon_closure(self, states: Set[State]) -> Set[State]:
+        """Вычисление ε-замыкания множества состояний"""
+        index = self.index()
+        closure = self.epsilon_closure_ids(index[state] for state in states)
+        by_index = self._by_index
+        return {by_index[sid] for sid in closure}
 
-        return any(state.is_final for state in current_states)
+    def process_input(self, input_string: str) -> bool:
+        """Обработка входной строки НКА"""
+        # Множества состояний и переходы между ними запоминаются в ленивом ДКА
+        # и переиспользуются между вызовами, поэтому ε-замыкание для каждой
+        # пары (множество, символ) считается только один раз
+        if self._lazy_dfa is None:
+            self._lazy_dfa = LazyDFA(self)
+        return self._lazy_dfa.process_input(input_string)
 
 
 class DFA:
     """Класс для представления детерминированного конечного автомата"""
+    # Предел числа состояний для байтовой таблицы: 256 столбцов по 4 байта
+    # на строку, то есть до 256 КиБ на ДКА (их держит еще и dfa_cache)
+    byte_mode_max_states = 256
 
     def __init__(self, states: Set[int], alphabet: Set[str],
                  transitions: Dict[int, Dict[str, int]],
@@ -86,124 +278,324 @@ class DFA:
         self.start_state = start_state
         self.accept_states = accept_states
 
+        # Упакованная таблица переходов: строка на состояние (последняя -
+        # ловушка), столбец на символ алфавита (последний - любой символ вне
+        # алфавита). В ячейках хранится сразу смещение строки следующего
+        # состояния, поэтому переход - это одно обращение tab[offset + column]
+        symbols = sorted(alphabet)
+        self._columns = {symbol: i for i, symbol in enumerate(symbols)}
+        self._other_column = len(symbols)
+        self._width = width = len(symbols) + 1
+
+        self._state_of_row = state_of_row = sorted(states)
+        rows = {state: i for i, state in enumerate(state_of_row)}
+        trap_offset = len(rows) * width
+        table = array('i', [trap_offset]) * (trap_offset + width)
+        for state, row in transitions.items():
+            if state not in rows:
+                continue
+            base = rows[state] * width
+            for symbol, target in row.items():
+                if symbol in self._columns:
+                    table[base + self._columns[symbol]] = rows[target] * width
+
+        self._table = table
+        self._rows = rows
+        self._start_offset = rows.get(start_state, len(rows)) * width
+
+        # Флаги допускающих состояний по номеру строки (у ловушки - 0):
+        # проверка допуска - чтение одного байта вместо поиска в множестве
+        self._is_final = is_final = bytearray(len(rows) + 1)
+        for state in accept_states:
+            if state in rows:
+                is_final[rows[state]] = 1
+
+        # Обязательный литеральный префикс: пока состояние не допускающее и
+        # из него ровно один переход, любая допускаемая строка идет по нему
+        prefix = []
+        state = start_state
+        while (len(prefix) < len(rows) and state not in accept_states
+               and len(transitions.get(state, ())) == 1):
+            (symbol, state), = transitions[state].items()
+            prefix.append(symbol)
+        self._prefix = ''.join(prefix)
+        self._prefix_offset = rows.get(state, len(rows)) * width
+
+        # Байтовый режим для ASCII-алфавита: строки по 256 столбцов,
+        # индексируемые самим байтом. Итерация по bytes дает готовые int,
+        # поэтому на символ не создается объект str и нет поиска столбца.
+        # Не-ASCII символы кодируются байтами >= 0x80 и уходят в ловушку.
+        # Сама таблица строится при первом process_input: промежуточный ДКА
+        # до минимизации ее никогда не использует
+        self._byte_mode = (len(rows) <= self.byte_mode_max_states
+                           and all(ord(symbol) < 128 for symbol in symbols))
+        self._byte_table = None
+
+    def _build_byte_table(self) -> None:
+        """Построение таблицы переходов байтового режима"""
+        table = self._table
+        width = self._width
+        rows = len(self._rows)
+        trap_row = rows << 8
+        byte_table = array('i', [trap_row]) * (trap_row + 256)
+        for row in range(rows):
+            base = row * width
+            byte_base = row << 8
+            for symbol, column in self._columns.items():
+                byte_table[byte_base + ord(symbol)] = table[base + column] // width << 8
+        self._byte_prefix = self._prefix.encode('ascii')
+        self._byte_table = byte_table
+
     def process_input(self, input_string: str) -> bool:
         """Обработка входной строки ДКА"""
-        current_state = self.start_state
+        if self._byte_mode:
+            if self._byte_table is None:
+                self._build_byte_table()
+            if isinstance(input_string, str):
+                input_string = input_string.encode('utf-8')
+            return self._process_bytes(input_string)
+        if isinstance(input_string, bytes):
+            input_string = input_string.decode('utf-8')
+
+        table = self._table
+        columns = self._columns
+        other = self._other_column
+        offset = self._start_offset
+
+        # Префикс проверяется одним вызовом startswith на C; строки без него
+        # отвергаются сразу, а ДКА стартует из состояния после префикса
+        prefix = self._prefix
+        if prefix:
+            if not input_string.startswith(prefix):
+                return False
+            offset = self._prefix_offset
+            input_string = input_string[len(prefix):]
 
+        # Один поиск столбца и одно чтение из таблицы на символ, без ветвлений
         for symbol in input_string:
-            if symbol not in self.alphabet:
-                return False  # Символ не в алфавите - строка отвергается
+            offset = table[offset + columns.get(symbol, other)]
 
-            if current_state in self.transitions and symbol in self.transitions[current_state]:
-                current_state = self.transitions[current_state][symbol]
-            else:
-                # Если нет перехода по символу, строка не принимается
+        return self._is_final[offset // self._width] == 1
+
+    def _process_bytes(self, data: bytes) -> bool:
+        """Обработка входной строки ДКА в байтовом режиме"""
+        table = self._byte_table
+        offset = self._start_offset // self._width << 8
+
+        prefix = self._byte_prefix
+        if prefix:
+            if not data.startswith(prefix):
                 return False
+            offset = self._prefix_offset // self._width << 8
+            data = data[len(prefix):]
+
+        # Одно чтение из таблицы на байт
+        for byte in data:
+            offset = table[offset + byte]
+
+        return self._is_final[offset >> 8] == 1
+
+    def minimize(self) -> 'DFA':
+        """Минимизация ДКА (алгоритм Хопкрофта)"""
+        # Отсутствующие переходы ведут в ловушку - добавляем ее явно,
+        # чтобы разбиение учитывало и "мертвые" переходы
+        trap = max(self.states, default=0) + 1
+        states = list(self.states) + [trap]
+
+        # Обратные переходы: символ -> состояние -> предшественники
+        inverse = {symbol: defaultdict(list) for symbol in self.alphabet}
+        for state in self.states:
+            row = self.transitions.get(state, {})
+            for symbol in self.alphabet:
+                inverse[symbol][row.get(symbol, trap)].append(state)
+        for symbol in self.alphabet:
+            inverse[symbol][trap].append(trap)
+
+        # Шаг 1: Начальное разбиение на допускающие и остальные состояния
+        accepting = set(self.accept_states) & self.states
+        blocks = [block for block in (set(accepting), set(states) - accepting) if block]
+        block_of = {state: i for i, block in enumerate(blocks) for state in block}
+
+        # Шаг 2: Уточнение разбиения по очереди разделителей
+        queue = deque(range(len(blocks)))
+        in_queue = set(queue)
+        while queue:
+            splitter_id = queue.popleft()
+            in_queue.discard(splitter_id)
+            splitter = list(blocks[splitter_id])
+
+            for symbol in self.alphabet:
+                # Предшественники разделителя по символу, сгруппированные по блокам
+                touched = defaultdict(set)
+                for target in splitter:
+                    for state in inverse[symbol].get(target, ()):
+                        touched[block_of[state]].add(state)
+
+                for block_id, part in touched.items():
+                    block = blocks[block_id]
+                    if len(part) == len(block):
+                        continue
 
-        return current_state in self.accept_states
+                    # Разбиваем блок: part уходит в новый блок
+                    block -= part
+                    new_id = len(blocks)
+                    blocks.append(part)
+                    for state in part:
+                        block_of[state] = new_id
+
+                    if block_id in in_queue:
+                        queue.append(new_id)
+                        in_queue.add(new_id)
+                    else:
+                        smaller = new_id if len(part) <= len(block) else block_id
+                        queue.append(smaller)
+                        in_queue.add(smaller)
+
+        # Шаг 3: Построение минимального ДКА; блок ловушки (все "мертвые"
+        # состояния) отбрасываем, состояния нумеруем в порядке обхода
+        dead = block_of[trap]
+        start = block_of[self.start_state]
+        numbering = {start: 0}
+        order = [start]
+        transitions = {}
+        accept_states = set()
+
+        for block_id in order:
+            new_state = numbering[block_id]
+            representative = next(iter(blocks[block_id]))
+            row = transitions[new_state] = {}
+
+            if block_id != dead and not accepting.isdisjoint(blocks[block_id]):
+                accept_states.add(new_state)
+            if block_id == dead:
+                continue
+
+            for symbol, target in self.transitions.get(representative, {}).items():
+                target_block = block_of.get(target, dead)
+                if target_block == dead:
+                    continue
+                if target_block not in numbering:
+                    numbering[target_block] = len(order)
+                    order.append(target_block)
+                row[symbol] = numbering[target_block]
+
+        return DFA(
+            states=set(range(len(order))),
+            alphabet=set(self.alphabet),
+            transitions=transitions,
+            start_state=0,
+            accept_states=accept_states
+        )
 
     def process_input_with_trace(self, input_string: str) -> Tuple[bool, List[int]]:
         """Обработка входной строки ДКА с возвратом пути"""
-        path = []
-        current_state = self.start_state
-        path.append(current_state)
+        # Все атрибуты связываются с локальными переменными один раз,
+        # в цикле только чтения из таблицы и append
+        table = self._table
+        columns = self._columns
+        width = self._width
+        trap = len(self._rows) * width
+        state_of_row = self._state_of_row
+        offset = self._start_offset
+
+        path = [self.start_state]
+        append = path.append
 
         for symbol in input_string:
-            if symbol not in self.alphabet:
+            column = columns.get(symbol)
+            if column is None:
                 return False, path  # Символ не в алфавите - строка отвергается
 
-            if current_state in self.transitions and symbol in self.transitions[current_state]:
-                current_state = self.transitions[current_state][symbol]
-                path.append(current_state)
-            else:
+            offset = table[offset + column]
+            if offset == trap:
                 return False, path
+            append(state_of_row[offset // width])
+
+        return self._is_final[offset // width] == 1, path
+
+
+class LazyDFA:
+    """ДКА, состояния которого строятся по требованию (ленивый алгоритм подмножеств)"""
+
+    def __init__(self, nfa: NFA, max_states: int = 10000):
+        self.nfa = nfa
+        self.max_states = max_states
+        self._reset()
+
+    def _reset(self):
+        """Сброс построенной части автомата"""
+        self._states = []  # ID -> множество состояний НКА
+        self._state_map = {}  # Множество состояний НКА -> ID
+        self._transitions = []  # ID -> {символ: ID}
+        self._accepting = []  # ID -> является ли состояние допускающим
+        self.start_state = self._add_state(frozenset(self.nfa.epsilon_closure({self.nfa.start})))
+
+    def _add_state(self, state_set: frozenset) -> int:
+        """Добавление нового состояния ДКА"""
+        state_id = len(self._states)
+        self._states.append(state_set)
+        self._state_map[state_set] = state_id
+        self._transitions.append({})
+        self._accepting.append(any(state.is_final for state in state_set))
+        return state_id
+
+    def _compute_transition(self, state_id: int, symbol: str) -> int:
+        """Вычисление перехода, которого еще нет в таблице (-1 - ловушка)"""
+        next_states = set()
+        for state in self._states[state_id]:
+            if symbol in state.transitions:
+                next_states.update(state.transitions[symbol])
+
+        if not next_states:
+            self._transitions[state_id][symbol] = -1
+            return -1
+
+        next_set = frozenset(self.nfa.epsilon_closure(next_states))
+        next_id = self._state_map.get(next_set)
+        if next_id is None:
+            if len(self._states) >= self.max_states:
+                # Таблица переполнена - сбрасываем ее и строим заново
+                self._reset()
+                return self._add_state(next_set)
+            next_id = self._add_state(next_set)
+
+        self._transitions[state_id][symbol] = next_id
+        return next_id
 
-        return current_state in self.accept_states, path
+    def process_input(self, input_string: str) -> bool:
+        """Обработка входной строки с достраиванием переходов по мере надобности"""
+        current_state = self.start_state
+
+        for symbol in input_string:
+            next_state = self._transitions[current_state].get(symbol)
+            if next_state is None:
+                next_state = self._compute_transition(current_state, symbol)
+            if next_state == -1:
+                return False
+            current_state = next_state
+
+        return self._accepting[current_state]
 
 
 class RegexInterpreter:
     """Интерпретатор регулярных выражений"""
+    # LRU-кэш построенных ДКА (регулярное выражение -> ДКА), общий для всех
+    # экземпляров. Состояния ДКА нумеруются локально (0..n-1) и не ссылаются
+    # на объекты State, поэтому сброс State.counter кэш не портит
+    dfa_cache: 'OrderedDict[str, DFA]' = OrderedDict()
+    dfa_cache_size = 1024
 
     def __init__(self):
-        self.operators = {'|', '*', '(', ')', '.', '+'}
-        self.precedence = {'|': 1, '.': 2, '*': 3, '+': 3}
+        self.operators = set(OPERATORS)
+        self.precedence = dict(PRECEDENCE)
 
     def add_concat_operator(self, regex: str) -> str:
         """Добавление оператора конкатенации (.) в явном виде"""
-        if not regex:
-            return regex
-
-        result = []
-        for i, char in enumerate(regex):
-            result.append(char)
-
-            if i + 1 < len(regex):
-                next_char = regex[i + 1]
-
-                # Вставляем . между:
-                # 1) символом и символом
-                # 2) символом и (
-                # 3) ) и символом
-                # 4) ) и (
-                # 5) * и символом
-                # 6) * и (
-                # 7) + и символом
-                # 8) + и (
-                current_is_operand = char not in self.operators or char in {'*', '+', ')'}
-                next_is_operand = next_char not in self.operators or next_char == '('
-
-                if current_is_operand and next_is_operand:
-                    result.append('.')
-
-        return ''.join(result)
+        return _add_concat_operator(regex)
 
     def to_postfix(self, regex: str) -> str:
         """Преобразование регулярного выражения в обратную польскую запись"""
-        if not regex:
-            return ''
-
-        # Добавляем оператор конкатенации
-        regex = self.add_concat_operator(regex)
-
-        output = []
-        stack = []
-
-        i = 0
-        while i < len(regex):
-            char = regex[i]
-
-            if char == '\\':  # Обработка экранирования
-                if i + 1 < len(regex):
-                    output.append(regex[i:i + 2])
-                    i += 2
-                continue
-
-            if char not in self.operators:
-                output.append(char)
-            elif char == '(':
-                stack.append(char)
-            elif char == ')':
-                while stack and stack[-1] != '(':
-                    output.append(stack.pop())
-                if stack and stack[-1] == '(':
-                    stack.pop()  # Удаляем '('
-                else:
-                    raise ValueError("Несогласованные скобки в регулярном выражении")
-            else:
-                while (stack and stack[-1] != '(' and
-                       self.precedence.get(stack[-1], 0) >= self.precedence.get(char, 0)):
-                    output.append(stack.pop())
-                stack.append(char)
-
-            i += 1
-
-        # Обработка оставшихся операторов в стеке
-        while stack:
-            if stack[-1] == '(':
-                raise ValueError("Несогласованные скобки в регулярном выражении")
-            output.append(stack.pop())
-
-        return ''.join(output)
+        return _to_postfix(regex)
 
     def build_nfa_from_postfix(self, postfix: str) -> NFA:
         """Построение НКА из обратной польской записи (алгоритм Томпсона)"""
@@ -314,71 +706,57 @@ class RegexInterpreter:
 
     def nfa_to_dfa(self, nfa: NFA, regex: str = "") -> DFA:
         """Преобразование НКА в ДКА (алгоритм подмножеств)"""
-        # Шаг 1: Инициализация
-        dfa_states = []
-        dfa_transitions = {}
-        state_map = {}  # Множество состояний НКА -> ID состояния ДКА
-
-        start_set = frozenset(nfa.epsilon_closure({nfa.start}))
-        queue = deque([start_set])
-        state_map[start_set] = 0
-        dfa_states.append(start_set)
+        # Шаг 1: Инициализация; НКА обходится по локальным номерам состояний
+        index = nfa.index()
+        final_ids = {sid for state, sid in index.items() if state.is_final}
 
+        dfa_transitions = {}
         accept_states = set()
 
-        # Шаг 2: Определение алфавита из регулярного выражения
-        alphabet = self.extract_alphabet_from_regex(regex)
+        start_set = frozenset(nfa.epsilon_closure_ids([index[nfa.start]]))
+        state_map = {start_set: 0}  # Множество номеров состояний НКА -> ID состояния ДКА
+        queue = deque([(0, start_set)])
+        closures = {}  # Множество номеров после move -> его ε-замыкание
+
+        # Шаг 2: Определение алфавита - один обход всех состояний НКА
+        # (regex больше не нужен и оставлен для совместимости)
+        alphabet = nfa.symbols()
 
         # Если алфавит пустой (например, для ε), добавляем заглушку
         if not alphabet:
             alphabet.add('a')
 
-        # Шаг 3: Построение таблицы переходов ДКА
+        # Шаг 3: Построение таблицы переходов ДКА.
+        # Храним только "живые" переходы: отсутствие символа в строке таблицы
+        # означает переход в ловушку, поэтому мертвые переходы не занимают места
         while queue:
-            current_set = queue.popleft()
-            current_id = state_map[current_set]
+            current_id, current_set = queue.popleft()
+            row = dfa_transitions[current_id] = {}
 
             # Проверяем, является ли состояние допускающим
-            if any(state.is_final for state in current_set):
+            if not final_ids.isdisjoint(current_set):
                 accept_states.add(current_id)
 
-            # Обрабатываем переходы по каждому символу алфавита
-            for symbol in alphabet:
-                next_states = set()
-
-                for state in current_set:
-                    if symbol in state.transitions:
-                        next_states.update(state.transitions[symbol])
+            # Один проход по переходам множества вместо перебора всего алфавита;
+            # символы сортируем, чтобы нумерация состояний была детерминированной
+            moves = nfa.moves(current_set)
+            for symbol in sorted(moves):
+                # Одинаковые результаты move часто повторяются (например, в
+                # (a|b)*), поэтому ε-замыкание запоминается по множеству до замыкания
+                key = frozenset(moves[symbol])
+                next_set = closures.get(key)
+                if next_set is None:
+                    next_set = closures[key] = frozenset(nfa.epsilon_closure_ids(key))
 
-                if next_states:
-                    epsilon_closure = nfa.epsilon_closure(next_states)
-                    next_set = frozenset(epsilon_closure)
+                next_id = state_map.get(next_set)
+                if next_id is None:
+                    next_id = state_map[next_set] = len(state_map)
+                    queue.append((next_id, next_set))
 
-                    if next_set not in state_map:
-                        state_map[next_set] = len(dfa_states)
-                        dfa_states.append(next_set)
-                        queue.append(next_set)
-
-                    if current_id not in dfa_transitions:
-                        dfa_transitions[current_id] = {}
-                    dfa_transitions[current_id][symbol] = state_map[next_set]
-                else:
-                    # Нет перехода по символу - добавляем переход в ловушку (отрицательное состояние)
-                    trap_state = -1
-                    if trap_state not in dfa_transitions:
-                        dfa_transitions[trap_state] = {}
-                    if current_id not in dfa_transitions:
-                        dfa_transitions[current_id] = {}
-                    dfa_transitions[current_id][symbol] = trap_state
+                row[symbol] = next_id
 
         # Шаг 4: Создание объекта ДКА
-        # Добавляем состояние-ловушку, если оно используется
-        all_states = set(range(len(dfa_states)))
-        if -1 in dfa_transitions:
-            all_states.add(-1)
-            # Добавляем переходы из ловушки в себя по всем символам
-            for symbol in alphabet:
-                dfa_transitions[-1][symbol] = -1
+        all_states = set(range(len(state_map)))
 
         dfa = DFA(
             states=all_states,
@@ -388,17 +766,54 @@ class RegexInterpreter:
             accept_states=accept_states
         )
 
-        return dfa
+        # Шаг 5: Минимизация
+        return dfa.minimize()
 
-    def regex_to_dfa(self, regex: str) -> DFA:
-        """Полный конвейер: регулярное выражение -> ДКА"""
+    def regex_to_dfa_literal(self, literal: str) -> DFA:
+        """Строка-литерал -> ДКА-цепочка без построения НКА и алгоритма подмножеств"""
+        transitions = {i: {char: i + 1} for i, char in enumerate(literal)}
+        transitions[len(literal)] = {}
+
+        return DFA(
+            states=set(range(len(literal) + 1)),
+            alphabet=set(literal),
+            transitions=transitions,
+            start_state=0,
+            accept_states={len(literal)}
+        )
+
+    def regex_to_lazy_dfa(self, regex: str) -> LazyDFA:
+        """Регулярное выражение -> ленивый ДКА (состояния строятся при обработке строк)"""
+        postfix = self.to_postfix(regex)
+        nfa = self.build_nfa_from_postfix(postfix)
+        return LazyDFA(nfa)
+
+    def _build_dfa(self, regex: str) -> DFA:
+        """Полный конвейер без кэша: регулярное выражение -> ДКА"""
         postfix = self.to_postfix(regex)
         nfa = self.build_nfa_from_postfix(postfix)
         return self.nfa_to_dfa(nfa, regex)
 
+    def regex_to_dfa(self, regex: str) -> DFA:
+        """Полный конвейер: регулярное выражение -> ДКА (с кэшированием)"""
+        cache = RegexInterpreter.dfa_cache
+        dfa = cache.get(regex)
+        if dfa is not None:
+            cache.move_to_end(regex)
+            return dfa
+
+        dfa = self._build_dfa(regex)
+        cache[regex] = dfa
+        if len(cache) > RegexInterpreter.dfa_cache_size:
+            cache.popitem(last=False)  # Вытесняем давно не использованный ДКА
+
+        return dfa
+
 
 class KMP:
     """Реализация алгоритма Кнута-Морриса-Пратта для поиска подстроки"""
+    # Для коротких шаблонов наивный поиск на C (str.find) быстрее KMP на Python
+    naive_max_pattern = 32
 
     @staticmethod
     def build_lps(pattern: str) -> List[int]:
@@ -427,28 +842,48 @@ class KMP:
     @staticmethod
     def search(text: str, pattern: str) -> List[int]:
         """Поиск всех вхождений pattern в text"""
+        if len(pattern) <= KMP.naive_max_pattern:
+            return KMP.search_literal(text, pattern)
+        return KMP.search_kmp(text, pattern)
+
+    @staticmethod
+    def search_kmp(text: str, pattern: str) -> List[int]:
+        """Поиск всех вхождений pattern в text алгоритмом KMP"""
         if not pattern:
             return []
 
         lps = KMP.build_lps(pattern)
+        last = len(pattern) - 1
         result = []
+        append = result.append
 
-        i = 0  # Индекс в text
         j = 0  # Индекс в pattern
-
-        while i < len(text):
-            if pattern[j] == text[i]:
-                i += 1
-                j += 1
-
-            if j == len(pattern):
-                result.append(i - j)
+        # Один проход по text в цикле for: без while и без вызовов len()
+        # на каждом шаге; при несовпадении откатываемся по таблице LPS
+        for i, char in enumerate(text):
+            while j and pattern[j] != char:
                 j = lps[j - 1]
-            elif i < len(text) and pattern[j] != text[i]:
-                if j != 0:
-                    j = lps[j - 1]
+
+            if pattern[j] == char:
+                if j == last:
+                    append(i - last)
+                    j = lps[j]
                 else:
-                    i += 1
+                    j += 1
+
+        return result
+
+    @staticmethod
+    def search_literal(text: str, pattern: str) -> List[int]:
+        """Поиск всех вхождений литерала pattern в text через str.find"""
+        if not pattern:
+            return []
+
+        result = []
+        i = text.find(pattern)
+        while i != -1:
+            result.append(i)
+            i = text.find(pattern, i + 1)
 
         return result
 
@@ -461,7 +896,7 @@ class RegexTester:
         """Генерация тестовой строки заданной длины"""
         if length <= 0:
             return ""
-        return ''.join(random.choice(alphabet) for _ in range(length))
+        return ''.join(random.choices(alphabet, k=length))
 
     @staticmethod
     def test_regex(regex: str, test_string: str, use_dfa: bool = True) -> Tuple[bool, List[int]]:
@@ -474,15 +909,16 @@ class RegexTester:
                 python_regex = regex
                 # Заменяем наш оператор конкатенации (если есть)
                 python_regex = python_regex.replace('.', '')
-                for match in re.finditer(python_regex, test_string):
+                for match in _compile_py(python_regex).finditer(test_string):
                     python_matches.append(match.start())
             except re.error:
                 # Если регулярное выражение некорректно для Python re
                 pass
 
-            # Используем наш интерпретатор
+            # Используем наш интерпретатор; состояния ДКА строятся
+            # только для реально встречающихся подстрок
             interpreter = RegexInterpreter()
-            dfa = interpreter.regex_to_dfa(regex)
+            dfa = interpreter.regex_to_lazy_dfa(regex)
 
             # Используем ДКА для поиска всех вхождений
             our_matches = []
@@ -504,19 +940,26 @@ class RegexTester:
     @staticmethod
     def compare_kmp_dfa(pattern: str, text: str) -> Tuple[List[int], List[int], bool]:
         """Сравнение результатов KMP и ДКА"""
-        kmp_matches = KMP.search(text, pattern)
-
-        interpreter = RegexInterpreter()
-        # Экранируем специальные символы
-        escaped_pattern = ''.join(f'\\{c}' if c in interpreter.operators else c for c in pattern)
-        dfa = interpreter.regex_to_dfa(escaped_pattern)
+        kmp_matches = KMP.search_kmp(text, pattern)
 
+        # Эталон для сверки: ДКА-цепочка запускается с каждой позиции text
+        # по своей таблице переходов, без str.find и без KMP
         dfa_matches = []
-        # Ищем подстроку pattern в тексте с помощью ДКА
-        for i in range(len(text) - len(pattern) + 1):
-            substring = text[i:i + len(pattern)]
-            if dfa.process_input(substring):
-                dfa_matches.append(i)
+        if pattern:
+            dfa = RegexInterpreter().regex_to_dfa_literal(pattern)
+            transitions = dfa.transitions
+            accept_states = dfa.accept_states
+            n = len(text)
+            for i in range(n):
+                state = dfa.start_state
+                # по индексам, без среза text[i:] на каждую стартовую позицию
+                for j in range(i, n):
+                    state = transitions[state].get(text[j])
+                    if state is None:
+                        break
+                    if state in accept_states:
+                        dfa_matches.append(i)
+                        break
 
         return kmp_matches, dfa_matches, kmp_matches == dfa_matches
 
@@ -527,21 +970,34 @@ class CSVHandler:
     @staticmethod
     def read_test_cases(filepath: str) -> List[Dict[str, str]]:
         """Чтение тестовых случаев из CSV файла"""
-        test_cases = []
+        return [{'regex': regex, 'test_string': test_string, 'expected': expected}
+                for regex, test_string, expected in CSVHandler.iter_test_cases(filepath)]
 
+    @staticmethod
+    def iter_test_cases(filepath: str) -> Iterator[Tuple[str, str, str]]:
+        """Потоковое чтение тестовых случаев (regex, test_string, expected) из CSV файла"""
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Файл {filepath} не найден")
 
+        return CSVHandler._iter_rows(filepath)
+
+    @staticmethod
+    def _iter_rows(filepath: str) -> Iterator[Tuple[str, str, str]]:
         try:
-            with open(filepath, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
+            with open(filepath, 'r', newline='', encoding='utf-8', buffering=1 << 20) as file:
+                # csv.reader отдает списки без словаря на каждую строку;
+                # нужные столбцы находим по заголовку один раз
+                reader = csv.reader(file)
+                header = next(reader, [])
+                columns = [header.index(name) if name in header else None
+                           for name in ('regex', 'test_string', 'expected')]
+
                 for row in reader:
-                    test_cases.append(dict(row))
+                    yield tuple(row[i] if i is not None and i < len(row) else ''
+                                for i in columns)
         except Exception as e:
             raise ValueError(f"Ошибка чтения CSV файла: {e}")
 
-        return test_cases
-
     @staticmethod
     def write_results(filepath: str, results: List[Dict[str, Any]]):
         """Запись результатов тестирования в CSV файл"""
@@ -559,81 +1015,112 @@ class CSVHandler:
             raise ValueError(f"Ошибка записи CSV файла: {e}")
 
 
+def _run_test_case(item: Tuple[int, Tuple[str, str, str]]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Выполнение одного тестового случая: (результат или None, строка отчета)"""
+    # Функция уровня модуля, чтобы ее можно было передать в ProcessPoolExecutor
+    i, (regex, test_string, expected) = item
+    regex = regex.strip()
+    test_string = test_string.strip()
+    expected = expected.strip().lower()
+
+    if not regex:
+        return None, f"Тест {i}: Пропущен (отсутствует регулярное выражение)"
+
+    try:
+        # Преобразуем ожидаемое значение в булево
+        expected_bool = expected in ('true', '1', 'yes', 'да', 't', 'y')
+
+        # Строим ДКА (кэш ДКА общий для всех интерпретаторов процесса)
+        dfa = RegexInterpreter().regex_to_dfa(regex)
+
+        # Тестируем
+        result = dfa.process_input(test_string)
+
+        # Проверяем результат
+        test_passed = (result == expected_bool)
+        status = "✓" if test_passed else "✗"
+
+        return {
+            'test_id': i,
+            'regex': regex,
+            'test_string': test_string,
+            'expected': expected,
+            'actual': str(result),
+            'status': 'PASS' if test_passed else 'FAIL'
+        }, f"Тест {i}: {status} {regex} на '{test_string}' -> ожидалось {expected_bool}, получено {result}"
+
+    except Exception as e:
+        return {
+            'test_id': i,
+            'regex': regex,
+            'test_string': test_string,
+            'expected': expected,
+            'actual': f"ERROR: {str(e)}",
+            'status': 'ERROR'
+        }, f"Тест {i}: ✗ Ошибка: {e}"
+
+
 class BatchTester:
     """Класс для пакетного тестирования"""
+    # Сколько строк CSV на процесс читается вперед при параллельном запуске
+    window_per_worker = 64
 
     def __init__(self):
         self.interpreter = RegexInterpreter()
         self.tester = RegexTester()
 
-    def test_from_csv(self, csv_file: str, output_file: str = None) -> Dict[str, Any]:
-        """Пакетное тестирование из CSV файла"""
+    @staticmethod
+    def _map_windowed(executor: ProcessPoolExecutor, items: Iterator, window: int) -> Iterator:
+        """executor.map по окнам из window элементов"""
+        # executor.map сразу вычитывает весь итератор, поэтому CSV целиком
+        # оказался бы в памяти; окнами файл читается по мере обработки
+        while True:
+            batch = list(islice(items, window))
+            if not batch:
+                return
+            yield from executor.map(_run_test_case, batch, chunksize=16)
+
+    def test_from_csv(self, csv_file: str, output_file: str = None, workers: int = 1) -> Dict[str, Any]:
+        """Пакетное тестирование из CSV файла (workers > 1 - в нескольких процессах)"""
         try:
-            test_cases = CSVHandler.read_test_cases(csv_file)
+            test_cases = CSVHandler.iter_test_cases(csv_file)
         except Exception as e:
             return {"error": str(e), "total": 0, "passed": 0, "failed": 0}
 
         results = []
         passed = 0
         failed = 0
+        total = 0
 
-        print(f"\nЗагружено {len(test_cases)} тестовых случаев")
+        print(f"\nЧтение тестовых случаев из {csv_file}")
         print("-" * 60)
 
-        for i, test_case in enumerate(test_cases, 1):
-            regex = test_case.get('regex', '').strip()
-            test_string = test_case.get('test_string', '').strip()
-            expected = test_case.get('expected', '').strip().lower()
-
-            if not regex:
-                print(f"Тест {i}: Пропущен (отсутствует регулярное выражение)")
-                continue
-
-            try:
-                # Преобразуем ожидаемое значение в булево
-                expected_bool = expected in ('true', '1', 'yes', 'да', 't', 'y')
-
-                # Строим ДКА
-                dfa = self.interpreter.regex_to_dfa(regex)
-
-                # Тестируем
-                result = dfa.process_input(test_string)
+        try:
+            numbered = enumerate(test_cases, 1)
+            with ExitStack() as stack:
+                if workers > 1:
+                    # Строки независимы: распределяем их по процессам,
+                    # map сохраняет исходный порядок результатов
+                    executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+                    outcomes = BatchTester._map_windowed(executor, numbered, workers * self.window_per_worker)
+                else:
+                    outcomes = map(_run_test_case, numbered)
 
-                # Проверяем результат
-                test_passed = (result == expected_bool)
+                for result_data, message in outcomes:
+                    total += 1
+                    print(message)
+                    if result_data is None:
+                        continue
 
-                if test_passed:
-                    status = "✓"
-                    passed += 1
-                else:
-                    status = "✗"
-                    failed += 1
-
-                # Сохраняем результат
-                result_data = {
-                    'test_id': i,
-                    'regex': regex,
-                    'test_string': test_string,
-                    'expected': expected,
-                    'actual': str(result),
-                    'status': 'PASS' if test_passed else 'FAIL'
-                }
-                results.append(result_data)
-
-                print(f"Тест {i}: {status} {regex} на '{test_string}' -> ожидалось {expected_bool}, получено {result}")
+                    if result_data['status'] == 'PASS':
+                        passed += 1
+                    else:
+                        failed += 1
+                    results.append(result_data)
+        except ValueError as e:
+            return {"error": str(e), "total": total, "passed": passed, "failed": failed}
 
-            except Exception as e:
-                failed += 1
-                result_data = {
-                    'test_id': i,
-                    'regex': regex,
-                    'test_string': test_string,
-                    'expected': expected,
-                    'actual': f"ERROR: {str(e)}",
-                    'status': 'ERROR'
-                }
-                results.append(result_data)
-                print(f"Тест {i}: ✗ Ошибка: {e}")
+        print(f"\nОбработано {total} тестовых случаев")
 
         # Записываем результаты, если указан выходной файл
         if output_file and results:
@@ -644,10 +1131,10 @@ class BatchTester:
                 print(f"\nОшибка сохранения результатов: {e}")
 
         return {
-            "total": len(test_cases),
+            "total": total,
             "passed": passed,
             "failed": failed,
-            "success_rate": (passed / len(test_cases)) * 100 if test_cases else 0
+            "success_rate": (passed / total) * 100 if total else 0
         }
 
 
@@ -671,23 +1158,7 @@ def display_dfa_info(dfa: DFA):
 
 def display_nfa_info(nfa: NFA):
     """Отображение информации о НКА"""
-    # Собираем все состояния
-    all_states = set()
-    stack = [nfa.start]
-
-    while stack:
-        state = stack.pop()
-        if state not in all_states:
-            all_states.add(state)
-            # Добавляем все состояния из переходов
-            for symbol, targets in state.transitions.items():
-                for target in targets:
-                    if target not in all_states:
-                        stack.append(target)
-            # Добавляем все состояния из ε-переходов
-            for target in state.epsilon_transitions:
-                if target not in all_states:
-                    stack.append(target)
+    all_states = nfa.states()
 
     print(f"\nИнформация о НКА:")
     print(f"  Количество состояний: {len(all_states)}")
@@ -863,7 +1334,7 @@ def main():
             if save == 'y':
                 filename = input("Имя файла (по умолчанию test_string.txt): ").strip() or "test_string.txt"
                 try:
-                    with open(filename, 'w', encoding='utf-8') as f:
+                    with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
                         f.write(test_string)
                     print(f"(GOOD) Строка сохранена в {filename}")
                 except Exception as e:
@@ -880,7 +1351,8 @@ def main():
             output_file = input("Введите путь для сохранения результатов (или Enter для пропуска): ").strip()
 
             print("\nЗапуск пакетного тестирования...")
-            results = batch_tester.test_from_csv(csv_file, output_file if output_file else None)
+            results = batch_tester.test_from_csv(csv_file, output_file if output_file else None,
+                                                 workers=os.cpu_count() or 1)
 
             if "error" in results:
                 print(f"(BAD) Ошибка: {results['error']}")
@@ -2,7 +2,7 @@ import unittest
 import tempfile
 import os
 import re
-from main import RegexInterpreter, DFA, KMP, RegexTester, State, NFA, CSVHandler
+from main import RegexInterpreter, DFA, LazyDFA, KMP, RegexTester, State, NFA, CSVHandler
 
 
 class TestRegexInterpreter(unittest.TestCase):
@@ -100,6 +100,7 @@ class TestRegexInterpreter(unittest.TestCase):
             with self.subTest(pattern=pattern, text=text):
                 result = KMP.search(text, pattern)
                 self.assertEqual(result, expected)
+                self.assertEqual(KMP.search_kmp(text, pattern), expected)
 
     def test_regex_tester_simple(self):
         """Тест сравнения с Python re для простых случаев"""
@@ -147,6 +148,66 @@ class TestRegexInterpreter(unittest.TestCase):
         self.assertEqual(dfa_matches, [0, 2, 4])
         self.assertTrue(equal)
 
+    def test_search_literal(self):
+        """Тест поиска литерала через str.find"""
+        self.assertEqual(KMP.search_literal("abababcabababc", "ababc"), [2, 9])
+        self.assertEqual(KMP.search_literal("aaaaa", "aaa"), [0, 1, 2])
+        self.assertEqual(KMP.search_literal("abc", ""), [])
+
+    def test_regex_to_dfa_literal(self):
+        """Тест построения ДКА-цепочки для литерала"""
+        dfa = RegexInterpreter().regex_to_dfa_literal("ab+")
+
+        self.assertEqual(dfa.states, {0, 1, 2, 3})
+        self.assertEqual(dfa.accept_states, {3})
+        self.assertTrue(dfa.process_input("ab+"))
+        self.assertFalse(dfa.process_input("abb"))
+        self.assertFalse(dfa.process_input("ab"))
+
+    def test_regex_to_dfa_cache(self):
+        """Тест кэширования ДКА по регулярному выражению"""
+        dfa1 = RegexInterpreter().regex_to_dfa("(a|b)*c")
+        dfa2 = RegexInterpreter().regex_to_dfa("(a|b)*c")
+
+        self.assertIs(dfa1, dfa2)
+        self.assertTrue(dfa2.process_input("abbac"))
+
+    def test_lazy_dfa(self):
+        """Тест ленивого ДКА"""
+        interpreter = RegexInterpreter()
+
+        for regex in ["a*b", "(a|b)*c", "a(b|c)d", "(ab)+"]:
+            lazy = interpreter.regex_to_lazy_dfa(regex)
+            dfa = interpreter.regex_to_dfa(regex)
+            for test_string in ["", "b", "ab", "aab", "abc", "abd", "acd", "abab", "ba", "x"]:
+                with self.subTest(regex=regex, string=test_string):
+                    self.assertEqual(lazy.process_input(test_string), dfa.process_input(test_string))
+
+        # При переполнении таблица сбрасывается, но результат не меняется
+        lazy = LazyDFA(interpreter.build_nfa_from_postfix(interpreter.to_postfix("(a|b)*abb")), max_states=2)
+        self.assertTrue(lazy.process_input("babaabb"))
+        self.assertFalse(lazy.process_input("babaab"))
+
+    def test_dfa_minimization(self):
+        """Тест минимизации ДКА (алгоритм Хопкрофта)"""
+        interpreter = RegexInterpreter()
+
+        test_cases = [
+            ("(a|b)*", 1),
+            ("a*b*", 2),
+            ("a(b|c)d", 4),
+            ("(a|b)*abb", 4),
+        ]
+
+        for regex, expected_states in test_cases:
+            with self.subTest(regex=regex):
+                dfa = interpreter.regex_to_dfa(regex)
+                self.assertEqual(len(dfa.states), expected_states)
+
+        dfa = interpreter.regex_to_dfa("(a|b)*abb")
+        self.assertTrue(dfa.process_input("babaabb"))
+        self.assertFalse(dfa.process_input("babaab"))
+
     def test_epsilon_transitions(self):
         """Тест ε-переходов"""
         interpreter = RegexInterpreter()
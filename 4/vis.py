@@ -2,16 +2,93 @@ import graphviz as gv
 from collections import defaultdict, deque
 import os
 import glob
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from PIL import Image
 from typing import Dict, List, Tuple, Set
 
+# Сколько DOT-файлов передается одному процессу dot при пакетной отрисовке
+DOT_BATCH_SIZE = 256
+
+
+# nslimit/nslimit1 и mclimit ограничивают число проходов network simplex
+# и минимизации пересечений - на больших автоматах они занимают основное время
+FAST_LAYOUT = {'nslimit': '2', 'nslimit1': '2', 'mclimit': '1.0'}
+
+# Предел кадров анимации поиска: дальше кадры не рисуются, результат считается без них
+MAX_RENDER_FRAMES = 200
+
+# Папка, куда пишутся все графы, кадры и GIF
+OUTPUT_DIR = "visualizations"
+
+
+def _dot_quote(text):
+    """Строка в кавычках для DOT-исходника"""
+    return '"' + str(text).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _dot_attrs(attrs):
+    """Список атрибутов DOT: key="value" ..."""
+    return ' '.join(f'{key}={_dot_quote(value)}' for key, value in attrs.items())
+
+
+def _node_attrs(is_start, is_final):
+    """Атрибуты вершины состояния: начальное закрашено, допускающее - двойной круг"""
+    node_attrs = {}
+
+    if is_start:
+        node_attrs['style'] = 'filled'
+        node_attrs['fillcolor'] = 'lightblue'
+
+    node_attrs['shape'] = 'doublecircle' if is_final else 'circle'
+    return node_attrs
+
+
+def _make_source(filename, lines, **graph_attrs):
+    """Граф из готовых строк DOT-исходника, без поштучных вызовов node/edge"""
+    # Прямые ребра вместо сплайнов: без трассировки ломаных
+    attrs = dict(FAST_LAYOUT, splines='line', **graph_attrs)
+    source = 'digraph {\n\tgraph [' + _dot_attrs(attrs) + ']\n' + '\n'.join(lines) + '\n}\n'
+    return gv.Source(source, filename=filename, format='png')
+
+
+@lru_cache(maxsize=None)
+def _output_dir():
+    """Папка для визуализаций; создается один раз за процесс, а не на каждый граф"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return OUTPUT_DIR
+
+
+def _save_graph(graph, filename, kind, rasterize=True):
+    """Сохранение графа в visualizations/: PNG или только DOT-исходник (rasterize=False)"""
+    output_path = os.path.join(_output_dir(), filename)
+
+    if not rasterize:
+        # Растеризация - самая дорогая часть; исходник можно отрисовать позже
+        # одним пакетным вызовом dot
+        graph.save(filename=output_path + '.dot')
+        print(f"✓ Граф {kind} сохранен как {output_path}.dot")
+        return
+
+    graph.render(filename=output_path, format='png', cleanup=True)
+    print(f"✓ Граф {kind} сохранен как {output_path}.png")
+
 
 class RegexEngine:
 
+    # fixed attribute set: no per-instance __dict__, slot access for hot lookups
+    __slots__ = ('regex', 'text', 'metacharacters', 'gv_states', 'gv_edges', 'match_transitions',
+                 'epsilon_transitions', 'star_dict', 'plus_dict', 'closure_dict', 'question_dict',
+                 'next_transition_dict', '_node_lines', '_skeleton_lines', '_match_edge_lines',
+                 '_epsilon_edge_lines', '_closure_cache', '_reach_masks', '_union_cache',
+                 '_class_masks', '_char_masks', '_step_cache', '_pending_graphs')
+
     def __init__(self, regex):
-        self.regex = self._tokenize("(" + regex + ")")
+        # the token list and the topology built from it never change, so they are tuples
+        self.regex = tuple(self._tokenize("(" + regex + ")"))
         self.text = None
-        self.metacharacters = "( ) | ? * + [ ] { }".split()
+        self.metacharacters = frozenset("( ) | ? * + [ ] { }".split())
 
         # get formatting states/edges
         self.gv_states, self.gv_edges = self._get_formatting_states()
@@ -28,6 +105,62 @@ class RegexEngine:
             self.next_transition_dict = \
             self._get_epsilon_transitions()
 
+        # epsilon closures per state, computed once and reused between search steps
+        self._closure_cache = {}
+
+        # row i: bitmask of every state reachable from i over epsilon edges (i included);
+        # match() only needs these masks, drawing still walks the arrows
+        self._reach_masks = self._transitive_closure()
+
+        # closure unions keyed by the bitmask of states after a match step
+        self._union_cache = {}
+
+        # (state bit, accepted characters) for every position that consumes a letter;
+        # metacharacter positions have no match transition and never match
+        self._class_masks = [(1 << state, self._class_mask(self.regex[state]))
+                             for state in self.match_transitions]
+
+        # letter -> bitmask of states whose token matches it, built on first use
+        self._char_masks = {}
+
+        # (state set, letter) -> next state set for match(), which draws nothing
+        self._step_cache = {}
+
+        # DOT sources waiting for a batched render (None - render each graph at once)
+        self._pending_graphs = None
+
+        # the graph topology never changes between frames: every node and edge line
+        # is formatted once here, frames only pick the idle or highlighted variant
+        # (idle, active) DOT lines per state
+        self._node_lines = [
+            (f'\t{idx} [label={_dot_quote(label)}]\n',
+             f'\t{idx} [label={_dot_quote(label)} color=green style=filled rank=sink]\n')
+            for idx, label in self.gv_states
+        ]
+
+        # invisible edges for proper node ordering
+        self._skeleton_lines = tuple(f'\t{tail} -> {head} [style=invis weight=10]\n'
+                                     for tail, head in self.gv_edges)
+
+        # match transition edges
+        self._match_edge_lines = self._edge_lines(self.match_transitions.items(), (":e", ":w"),
+                                                  color="black", weight="10")
+
+        # next state epsilon edges, then *, +, ? and | closure edges with their compass ports
+        epsilon_edge_groups = (
+            (self.star_dict["N"], (":ne", ":nw")),
+            (self.star_dict["S"], (":sw", ":se")),
+            (self.plus_dict["N"], (":nw", ":ne")),
+            (self.question_dict["N"], ("", "")),
+            (self.question_dict["S"], (":sw", ":se")),
+            (self.closure_dict["("], ("", "")),
+            (self.closure_dict["|"], ("", "")),
+        )
+        self._epsilon_edge_lines = self._edge_lines(self.next_transition_dict["next"], (":e", ":w"),
+                                                    color="red", weight="10")
+        for edges, ports in epsilon_edge_groups:
+            self._epsilon_edge_lines += self._edge_lines(edges, ports, color="red")
+
     @staticmethod
     def _tokenize(regex):
         regex_symbols = deque(regex)
@@ -67,8 +200,8 @@ class RegexEngine:
             regex_symbols.popleft()  # pop space
             max_reps = int(regex_symbols.popleft())
 
-            [regex_tokens.extend(repeat_token) for _ in range(min_reps - 1)]
-            [regex_tokens.extend(repeat_token + ["?"]) for _ in range(max_reps - min_reps)]
+            regex_tokens.extend(repeat_token * (min_reps - 1))
+            regex_tokens.extend((repeat_token + ["?"]) * (max_reps - min_reps))
             regex_symbols.popleft()  # remove right curly bracket
 
         while regex_symbols:
@@ -82,10 +215,6 @@ class RegexEngine:
 
         return regex_tokens
 
-    @staticmethod
-    def _text_range(start, stop):
-        return "".join([chr(num) for num in range(ord(start), ord(stop) + 1)])
-
     def _get_formatting_states(self):
         states_list = []
         invisible_transitions = []
@@ -99,7 +228,7 @@ class RegexEngine:
         states_list.append((len(self.regex), ""))
         invisible_transitions.append((len(self.regex) - 1, len(self.regex)))
 
-        return states_list, invisible_transitions
+        return tuple(states_list), tuple(invisible_transitions)
 
     def _get_match_transitions(self):
         match_transitions = {}
@@ -128,8 +257,10 @@ class RegexEngine:
                         or_idx_list.append(op_idx)
                     elif self.regex[op_idx] == "(":
                         left_paren_idx = op_idx
-                        [closure_dict["("].append((left_paren_idx, or_idx + 1)) for or_idx in or_idx_list]
-                        [closure_dict["|"].append((or_idx, i)) for or_idx in or_idx_list]
+                        for or_idx in or_idx_list:
+                            closure_dict["("].append((left_paren_idx, or_idx + 1))
+                        for or_idx in or_idx_list:
+                            closure_dict["|"].append((or_idx, i))
                         break
 
             elif unit == "]":
@@ -151,7 +282,13 @@ class RegexEngine:
         epsilon_transitions = self._combine_epsilon_edges(star_dict, plus_dict, closure_dict,
                                                           next_transition_dict, question_dict)
 
-        return epsilon_transitions, star_dict, plus_dict, closure_dict, question_dict, next_transition_dict
+        freeze = self._freeze_edges
+        return (epsilon_transitions, freeze(star_dict), freeze(plus_dict), freeze(closure_dict),
+                freeze(question_dict), freeze(next_transition_dict))
+
+    @staticmethod
+    def _freeze_edges(edge_dict):
+        return {key: tuple(edges) for key, edges in edge_dict.items()}
 
     @staticmethod
     def _combine_epsilon_edges(*args):
@@ -160,12 +297,20 @@ class RegexEngine:
             for coord_list in edge_dict.values():
                 for tup in coord_list:
                     epsilon_transitions[tup[0]].append(tup[1])
-        return epsilon_transitions
+        return RegexEngine._freeze_edges(epsilon_transitions)
 
     def _draw_nfa(self, active_states, active_match_transitions, active_epsilon_transitions, letter_idx,
                   filename="nfa"):
 
-        graph = gv.Digraph(filename=filename, format='png')
+        # active states/edges come in as lists (epsilon arrows with repeats);
+        # sets make every membership check below O(1)
+        active_states = set(active_states)
+        active_match_transitions = set(active_match_transitions)
+        active_epsilon_transitions = set(active_epsilon_transitions)
+
+        # edges attached to compass ports need curved splines to stay readable,
+        # so splines are left at the default here
+        graph_attrs = _dot_attrs(dict(FAST_LAYOUT, ranksep=".25", rankdir="LR"))
 
         if self.text:
             header_text = f'''<<table border="0" cellborder="1" cellspacing="0">
@@ -183,168 +328,274 @@ class RegexEngine:
 
             header_text += "</tr></table>>"
 
-            graph.attr(ranksep=".25", rankdir="LR", labelloc="t", fontsize="22", shape="plain", label=header_text)
-        else:
-            graph.attr(ranksep=".25", rankdir="LR")
-
-        # add states
-        for idx, label in self.gv_states:
-            if idx in active_states:
-                graph.node(str(idx), str(label), color="green", style="filled", rank="sink")
-            else:
-                graph.node(str(idx), str(label))
-
-        # add invisible edges for proper node ordering
-        [graph.edge(str(tail), str(head), style="invis", weight="10") for tail, head in self.gv_edges]
-
-        # add match transition edges
-        for tail, head in self.match_transitions.items():
-            if (tail, head) in active_match_transitions:
-                graph.edge(str(tail) + ":e", str(head) + ":w", color="black", weight="10", style="bold",
-                           arrowsize="1.33")
-            else:
-                graph.edge(str(tail) + ":e", str(head) + ":w", color="black", weight="10")
-
-        # add next state epsilon transition edges
-        for tail, head in self.next_transition_dict["next"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail) + ":e", str(head) + ":w", color="red", weight="10", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail) + ":e", str(head) + ":w", color="red", weight="10")
-
-        # add * edges
-        for tail, head in self.star_dict["N"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail) + ":ne", str(head) + ":nw", color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail) + ":ne", str(head) + ":nw", color="red")
-
-        for tail, head in self.star_dict["S"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail) + ":sw", str(head) + ":se", color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail) + ":sw", str(head) + ":se", color="red")
-
-        # add + edges
-        for tail, head in self.plus_dict["N"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail) + ":nw", str(head) + ":ne", color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail) + ":nw", str(head) + ":ne", color="red")
-
-        # add ? edges
-        for tail, head in self.question_dict["N"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail), str(head), color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail), str(head), color="red")
-
-        for tail, head in self.question_dict["S"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail) + ":sw", str(head) + ":se", color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail) + ":sw", str(head) + ":se", color="red")
-
-        # add | closure edges
-        for tail, head in self.closure_dict["("]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail), str(head), color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail), str(head), color="red")
-
-        for tail, head in self.closure_dict["|"]:
-            if (tail, head) in active_epsilon_transitions:
-                graph.edge(str(tail), str(head), color="red", arrowsize="1.33", style="bold")
-            else:
-                graph.edge(str(tail), str(head), color="red")
+            # HTML-like label goes into the source as is, without quoting
+            graph_attrs += f' labelloc="t" fontsize="22" shape="plain" label={header_text}'
+
+        # only the highlighting differs between frames: pick the precomputed
+        # idle or active line for every node and edge
+        lines = ['digraph {\n\tgraph [', graph_attrs, ']\n']
+        lines.extend(active_line if idx in active_states else idle_line
+                     for idx, (idle_line, active_line) in enumerate(self._node_lines))
+        lines.extend(self._skeleton_lines)
+        lines.extend(bold if edge in active_match_transitions else plain
+                     for edge, plain, bold in self._match_edge_lines)
+        lines.extend(bold if edge in active_epsilon_transitions else plain
+                     for edge, plain, bold in self._epsilon_edge_lines)
+        lines.append('}\n')
+
+        source = ''.join(lines)
+        output_path = os.path.join(_output_dir(), filename)
+
+        # during search only the DOT source is written, straight to the file
+        # without a graphviz wrapper object; frames are rendered in batches
+        if self._pending_graphs is not None:
+            with open(output_path, 'w', encoding='utf-8') as dot_file:
+                dot_file.write(source)
+            self._pending_graphs.append(output_path)
+            return
 
         # Save as PNG only (no intermediate DOT file)
-        output_dir = "visualizations"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, filename)
+        graph = gv.Source(source, filename=filename, format='png')
         graph.render(filename=output_path, format='png', cleanup=True)
         print(f"✓ Визуализация сохранена как {output_path}.png")
 
     @staticmethod
-    def _digraph_dfs(graph, node, draw=False):
+    def _edge_lines(edges, ports, **attrs):
+        # (edge, plain line, bold line); active edges are drawn bold with larger arrows
+        tail_port, head_port = ports
+        plain = _dot_attrs(attrs)
+        bold = _dot_attrs(dict(attrs, arrowsize="1.33", style="bold"))
+        return tuple(
+            ((tail, head),
+             f'\t{tail}{tail_port} -> {head}{head_port} [{plain}]\n',
+             f'\t{tail}{tail_port} -> {head}{head_port} [{bold}]\n')
+            for tail, head in edges
+        )
+
+    @staticmethod
+    def _render_batch(paths):
+        # one dot process per batch instead of one per frame; -O writes
+        # <source>.png next to each source. dot runs in its own process, so a
+        # thread pool is enough to keep one batch per CPU in flight, and a new
+        # batch starts as soon as any running one finishes
+        workers = os.cpu_count() or 1
+        size = min(DOT_BATCH_SIZE, max(1, -(-len(paths) // workers)))
+        batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+
+        def render(batch):
+            subprocess.run(['dot', '-Tpng', '-O', *batch], check=True)
+            return batch
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch in executor.map(render, batches):
+                for path in batch:
+                    os.remove(path)
+                    print(f"✓ Визуализация сохранена как {path}.png")
+
+    @staticmethod
+    def _epsilon_dfs(graph, node):
+        # iterative worklist: no recursion depth limit on long regexes
         reachable_states = []
         epsilon_arrows = []
+        seen = {node}
+        stack = [node]
 
-        def find_states(graph, node):
-            if node in reachable_states:
-                return
-            elif node not in graph.keys():
-                reachable_states.append(node)
-                return
-            else:
-                reachable_states.append(node)
-                for state in graph[node]:
-                    epsilon_arrows.append((node, state))
-                    find_states(graph, state)
+        while stack:
+            current = stack.pop()
+            reachable_states.append(current)
+            for state in graph.get(current, ()):
+                epsilon_arrows.append((current, state))
+                if state not in seen:
+                    seen.add(state)
+                    stack.append(state)
 
-        find_states(graph, node)
+        return reachable_states, epsilon_arrows
+
+    @staticmethod
+    def _digraph_dfs(graph, node, draw=False):
+        reachable_states, epsilon_arrows = RegexEngine._epsilon_dfs(graph, node)
 
         if draw:
             return epsilon_arrows
         else:
             return reachable_states
 
+    def _epsilon_closure(self, node):
+        # (bitmask of reachable states, epsilon arrows) for a state, cached per engine;
+        # bit i of the mask is set when state i is in the closure
+        closure = self._closure_cache.get(node)
+        if closure is None:
+            reachable_states, arrows = self._epsilon_dfs(self.epsilon_transitions, node)
+            mask = 0
+            for state in reachable_states:
+                mask |= 1 << state
+            closure = self._closure_cache[node] = (mask, arrows)
+        return closure
+
+    def _transitive_closure(self):
+        # Warshall's algorithm on bitset rows: once state k is reachable from i,
+        # everything reachable from k is too
+        size = len(self.regex) + 1
+        reach = [1 << state for state in range(size)]
+        for tail, heads in self.epsilon_transitions.items():
+            for head in heads:
+                reach[tail] |= 1 << head
+
+        for k in range(size):
+            k_bit = 1 << k
+            k_row = reach[k]
+            for i in range(size):
+                if reach[i] & k_bit:
+                    reach[i] |= k_row
+        return reach
+
+    def _reach_of_mask(self, mask):
+        # union of the reach rows of all states in mask
+        reach = self._reach_masks
+        epsilon_mask = 0
+        while mask:
+            low_bit = mask & -mask
+            epsilon_mask |= reach[low_bit.bit_length() - 1]
+            mask ^= low_bit
+        return epsilon_mask
+
+    def _closure_of_mask(self, mask):
+        # union of the closures of all states in mask; a state already in the union
+        # has its whole closure (and its arrows) there, so it is skipped
+        closure = self._union_cache.get(mask)
+        if closure is None:
+            # overlapping closures share arrows; dict keys keep each arrow once, in order
+            epsilon_mask = 0
+            epsilon_arrows = {}
+            for node in self._mask_states(mask):
+                if epsilon_mask >> node & 1:
+                    continue
+                node_mask, arrows = self._epsilon_closure(node)
+                epsilon_mask |= node_mask
+                epsilon_arrows.update(dict.fromkeys(arrows))
+            closure = self._union_cache[mask] = (epsilon_mask, list(epsilon_arrows))
+        return closure
+
+    @staticmethod
+    def _class_mask(char_group):
+        # set of characters a token accepts as an int with bit ord(c) per character;
+        # "." accepts anything (-1 has every bit set), x-y ranges are expanded once
+        if "." in char_group:
+            return -1
+        mask = 0
+        for char in char_group:
+            mask |= 1 << ord(char)
+        for idx in range(1, len(char_group) - 1):
+            if char_group[idx] == "-":
+                low, high = ord(char_group[idx - 1]), ord(char_group[idx + 1])
+                if low <= high:
+                    mask |= ((1 << (high - low + 1)) - 1) << low
+        return mask
+
+    def _char_mask(self, letter):
+        mask = self._char_masks.get(letter)
+        if mask is None:
+            mask = 0
+            letter_bit = 1 << ord(letter)
+            for state_bit, class_mask in self._class_masks:
+                if class_mask & letter_bit:
+                    mask |= state_bit
+            self._char_masks[letter] = mask
+        return mask
+
+    @staticmethod
+    def _mask_states(mask):
+        # states of a bitmask in ascending order
+        states = []
+        while mask:
+            low_bit = mask & -mask
+            states.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return states
+
+    def _step(self, epsilon_mask, letter):
+        # one character of the simulation: active states that accept the letter,
+        # their successors, and the bitmask of successors
+        matched_states = self._mask_states(epsilon_mask & self._char_mask(letter))
+        next_states = [self.match_transitions[node] for node in matched_states]
+
+        next_mask = 0
+        for node in next_states:
+            next_mask |= 1 << node
+        return matched_states, next_states, next_mask
+
+    def match(self, text):
+        """Проверка совпадения без отрисовки кадров"""
+        final_bit = 1 << len(self.regex)
+        epsilon_mask = self._reach_masks[0]
+
+        for letter in text:
+            if epsilon_mask & final_bit or not epsilon_mask:
+                break
+
+            # (state set, letter) -> next state set is memoized, so repeated
+            # state sets are stepped with a single dict lookup
+            key = (epsilon_mask, letter)
+            next_epsilon_mask = self._step_cache.get(key)
+            if next_epsilon_mask is None:
+                next_mask = self._step(epsilon_mask, letter)[2]
+                next_epsilon_mask = self._step_cache[key] = self._reach_of_mask(next_mask)
+            epsilon_mask = next_epsilon_mask
+
+        return bool(epsilon_mask & final_bit)
+
     def search(self, text, filename_prefix="nfa_state_"):
+        # three frames per letter plus the start/accept frames; past the budget
+        # the animation is unwatchable anyway, so only the answer is computed
+        expected_frames = 3 * len(text) + 2
+        if expected_frames > MAX_RENDER_FRAMES:
+            print(f"⚠ Анимация пропущена (>{MAX_RENDER_FRAMES} кадров), выполняется только сопоставление")
+            return self.match(text)
+
+        self._pending_graphs = []
+        try:
+            return self._search(text, filename_prefix)
+        finally:
+            paths, self._pending_graphs = self._pending_graphs, None
+            self._render_batch(paths)
+
+    def _search(self, text, filename_prefix):
         self.text = text
 
+        final_bit = 1 << len(self.regex)
+
         # get epsilon states before scanning first character
-        epsilon_states = self._digraph_dfs(self.epsilon_transitions, 0)
-        epsilon_arrows = self._digraph_dfs(self.epsilon_transitions, 0, draw=True)
+        epsilon_mask, epsilon_arrows = self._epsilon_closure(0)
+        epsilon_states = self._mask_states(epsilon_mask)
 
         graph_state = 0
         self._draw_nfa(epsilon_states, (), epsilon_arrows, 0, f"{filename_prefix}{str(graph_state).zfill(3)}")
         graph_state += 1
 
-        if len(self.regex) in epsilon_states:
+        if epsilon_mask & final_bit:
             self._draw_nfa([len(self.regex)], (), (), 0, f"{filename_prefix}{str(graph_state).zfill(3)}")
             return True
 
-        epsilon_chars = [self.regex[state] for state in epsilon_states]
-
         for i, letter in enumerate(text):
             self._draw_nfa(epsilon_states, (), epsilon_arrows, i + 1, f"{filename_prefix}{str(graph_state).zfill(3)}")
             graph_state += 1
 
-            matched_states = []
-            for state, char_group in zip(epsilon_states, epsilon_chars):
-                if letter in char_group or "." in char_group:
-                    matched_states.append(state)
-                elif "-" in char_group:
-                    ranges = ""
-                    for idx, char in enumerate(char_group):
-                        if char == "-":
-                            ranges += self._text_range(char_group[idx - 1], char_group[idx + 1])
-                    if letter in ranges:
-                        matched_states.append(state)
-
-            next_states = []
-            [next_states.append(self.match_transitions[node]) for node in matched_states]
+            matched_states, next_states, next_mask = self._step(epsilon_mask, letter)
 
             match_arrows = list(zip(matched_states, next_states))
             self._draw_nfa(next_states, match_arrows, (), i + 1, f"{filename_prefix}{str(graph_state).zfill(3)}")
             graph_state += 1
 
-            epsilon_states = []
-            [epsilon_states.extend(self._digraph_dfs(self.epsilon_transitions, node)) for node in next_states]
-
-            epsilon_arrows = []
-            [epsilon_arrows.extend(self._digraph_dfs(self.epsilon_transitions, node, draw=True)) for node in
-             next_states]
+            epsilon_mask, epsilon_arrows = self._closure_of_mask(next_mask)
+            epsilon_states = self._mask_states(epsilon_mask)
 
             self._draw_nfa(epsilon_states, (), epsilon_arrows, i + 1, f"{filename_prefix}{str(graph_state).zfill(3)}")
             graph_state += 1
 
-            if len(self.regex) in epsilon_states:
+            if epsilon_mask & final_bit:
                 self._draw_nfa([len(self.regex)], (), (), i + 1, f"{filename_prefix}{str(graph_state).zfill(3)}")
                 return True
 
-            epsilon_chars = [self.regex[state] for state in epsilon_states]
-
         return False
 
     def draw_regex_nfa(self, filename="regex_nfa"):
@@ -356,23 +607,42 @@ class DFAGraphVisualizer:
     """Класс для визуализации ДКА"""
 
     @staticmethod
-    def visualize_dfa(dfa, filename="dfa_graph"):
-        """Визуализация детерминированного конечного автомата"""
-        graph = gv.Digraph(filename=filename, format='png')
-        graph.attr(rankdir='LR', size='10,7')
+    def _reachable_states(dfa):
+        """Состояния ДКА, достижимые из начального, в порядке обхода в ширину"""
+        # dict сохраняет порядок вставки и дает O(1) проверку принадлежности
+        reachable = {dfa.start_state: None}
+        queue = deque([dfa.start_state])
 
-        # Добавляем состояния
-        for state in sorted(dfa.states):
-            node_attrs = {}
+        while queue:
+            state = queue.popleft()
+            for to_state in dfa.transitions.get(state, {}).values():
+                if to_state not in reachable:
+                    reachable[to_state] = None
+                    queue.append(to_state)
 
-            if state == dfa.start_state:
-                node_attrs['style'] = 'filled'
-                node_attrs['fillcolor'] = 'lightblue'
+        return reachable
 
-            if state in dfa.accept_states:
-                node_attrs['shape'] = 'doublecircle'
-            else:
-                node_attrs['shape'] = 'circle'
+    @staticmethod
+    def visualize_dfa(dfa, filename="dfa_graph", show_all_states=False, rasterize=True):
+        """Визуализация детерминированного конечного автомата"""
+        # Недостижимые состояния не рисуем (кроме режима отладки show_all_states):
+        # меньше вершин и ребер - быстрее раскладка dot. Состояния минимизированного
+        # ДКА пронумерованы обходом в ширину, поэтому порядок обхода уже совпадает
+        # с сортировкой и отдельная сортировка не нужна
+        if show_all_states:
+            states = dict.fromkeys(sorted(dfa.states))
+        else:
+            states = DFAGraphVisualizer._reachable_states(dfa)
+
+        # DOT-исходник собирается строками и передается graphviz целиком;
+        # имена вершин экранируются один раз на состояние, а не на каждое ребро
+        lines = []
+        append = lines.append
+        names = {state: _dot_quote(state) for state in states}
+
+        # Добавляем состояния
+        for state in states:
+            node_attrs = _node_attrs(state == dfa.start_state, state in dfa.accept_states)
 
             if state == -1:  # Ловушка
                 node_attrs['style'] = 'filled'
@@ -381,142 +651,177 @@ class DFAGraphVisualizer:
             else:
                 node_attrs['label'] = f'q{state}'
 
-            graph.node(str(state), **node_attrs)
+            append(f'\t{names[state]} [{_dot_attrs(node_attrs)}]')
 
         # Добавляем начальную стрелку
-        graph.node('start', shape='point')
-        graph.edge('start', str(dfa.start_state))
+        append('\tstart [shape=point]')
+        append(f'\tstart -> {names[dfa.start_state]}')
 
-        # Добавляем переходы
+        # Добавляем переходы; параллельные ребра объединяем в одно
+        # с общей меткой - меньше ребер для раскладки dot
+        edges = defaultdict(list)
         for from_state, transitions in dfa.transitions.items():
+            if from_state not in states:
+                continue
             for symbol, to_state in transitions.items():
-                graph.edge(str(from_state), str(to_state), label=symbol)
+                edges[from_state, to_state].append(symbol)
+
+        for (from_state, to_state), symbols in edges.items():
+            label = _dot_quote(','.join(sorted(symbols)))
+            to_name = names.get(to_state) or _dot_quote(to_state)
+            append(f'\t{names[from_state]} -> {to_name} [label={label}]')
+
+        graph = _make_source(filename, lines, rankdir='LR', size='10,7')
 
         # Сохраняем
-        output_dir = "visualizations"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, filename)
-        graph.render(filename=output_path, format='png', cleanup=True)
-        print(f"✓ Граф ДКА сохранен как {output_path}.png")
+        _save_graph(graph, filename, "ДКА", rasterize)
 
 
 class NFAGraphVisualizer:
     """Класс для визуализации НКА"""
 
     @staticmethod
-    def _collect_nfa_states(start_state, visited=None):
+    def _collect_nfa_states(start_state):
         """Сбор всех состояний НКА"""
-        if visited is None:
-            visited = set()
-
-        if start_state in visited:
-            return visited
+        # Итеративный обход со стеком: без рекурсии и RecursionError на больших НКА
+        visited = {start_state}
+        stack = [start_state]
+
+        while stack:
+            state = stack.pop()
+            for targets in state.transitions.values():
+                for target in targets:
+                    if target not in visited:
+                        visited.add(target)
+                        stack.append(target)
 
-        visited.add(start_state)
+            for target in state.epsilon_transitions:
+                if target not in visited:
+                    visited.add(target)
+                    stack.append(target)
 
-        for symbol, states in start_state.transitions.items():
-            for state in states:
-                NFAGraphVisualizer._collect_nfa_states(state, visited)
+        return visited
 
-        for state in start_state.epsilon_transitions:
-            NFAGraphVisualizer._collect_nfa_states(state, visited)
+    @staticmethod
+    def _iter_nfa_transitions(states):
+        """Переходы НКА в виде троек (состояние откуда, метка, состояние куда)"""
+        for state in states:
+            for symbol, target_states in state.transitions.items():
+                for target in target_states:
+                    yield state, symbol, target
 
-        return visited
+            for target in state.epsilon_transitions:
+                yield state, 'ε', target
 
     @staticmethod
-    def visualize_nfa(nfa, filename="nfa_graph"):
+    def visualize_nfa(nfa, filename="nfa_graph", rasterize=True):
         """Визуализация недетерминированного конечного автомата"""
-        graph = gv.Digraph(filename=filename, format='png')
-        graph.attr(rankdir='LR', size='10,7')
-
         # Собираем все состояния
         all_states = NFAGraphVisualizer._collect_nfa_states(nfa.start)
 
+        # DOT-исходник собирается строками и передается graphviz целиком;
+        # ID переводятся в строки один раз на состояние, а не на каждое ребро
+        lines = []
+        append = lines.append
+        names = {state: str(state.id) for state in all_states}
+
         # Добавляем состояния
         for state in all_states:
-            node_attrs = {}
+            node_attrs = _node_attrs(state == nfa.start, state.is_final)
 
-            if state == nfa.start:
-                node_attrs['style'] = 'filled'
-                node_attrs['fillcolor'] = 'lightblue'
+            name = names[state]
+            append(f'\t{name} [label="q{name}" {_dot_attrs(node_attrs)}]')
 
-            if state.is_final:
-                node_attrs['shape'] = 'doublecircle'
+        # Добавляем начальную стрелку
+        append('\tstart [shape=point]')
+        append(f'\tstart -> {names[nfa.start]}')
+
+        # Добавляем переходы; параллельные ребра объединяем в одно
+        # с общей меткой - меньше ребер для раскладки dot
+        edges = {}
+        for from_state, symbol, to_state in NFAGraphVisualizer._iter_nfa_transitions(all_states):
+            symbols = edges.get((from_state, to_state))
+            if symbols is None:
+                edges[from_state, to_state] = [symbol]
             else:
-                node_attrs['shape'] = 'circle'
+                symbols.append(symbol)
 
-            graph.node(str(state.id), label=f"q{state.id}", **node_attrs)
+        for (from_state, to_state), symbols in edges.items():
+            label = symbols[0] if len(symbols) == 1 else ','.join(sorted(set(symbols)))
+            append(f'\t{names[from_state]} -> {names[to_state]} [label={_dot_quote(label)}]')
 
-        # Добавляем начальную стрелку
-        graph.node('start', shape='point')
-        graph.edge('start', str(nfa.start.id))
+        graph = _make_source(filename, lines, rankdir='LR', size='10,7')
 
-        # Добавляем переходы
-        for state in all_states:
-            for symbol, target_states in state.transitions.items():
-                for target in target_states:
-                    graph.edge(str(state.id), str(target.id), label=symbol)
+        # Сохраняем
+        _save_graph(graph, filename, "НКА", rasterize)
 
-            for target in state.epsilon_transitions:
-                graph.edge(str(state.id), str(target.id), label='ε')
 
-        # Сохраняем
-        output_dir = "visualizations"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, filename)
-        graph.render(filename=output_path, format='png', cleanup=True)
-        print(f"✓ Граф НКА сохранен как {output_path}.png")
+def _iter_gif_frames(paths):
+    """Кадры GIF по одному: каждый PNG открывается, декодируется и сразу закрывается"""
+    for img_path in paths:
+        with Image.open(img_path) as frame:
+            frame.load()
+            yield frame
 
 
 def create_gif_from_visualizations():
     """Создать GIF из всех визуализаций в папке"""
-    frames = []
-    imgs = glob.glob("visualizations/*.png")
+    imgs = sorted(glob.glob(os.path.join(OUTPUT_DIR, "*.png")))
     if not imgs:
         print("⚠ Нет изображений для создания GIF")
         return
 
-    for img_path in sorted(imgs):
-        frames.append(Image.open(img_path))
-
-    gif_path = "visualizations/automata_process.gif"
-    frames[0].save(gif_path, format='GIF',
-                   append_images=frames[1:],
+    # Кадры подаются генератором, а не списком открытых Image: одновременно
+    # открыт только один файл PNG. Память при этом не ограничена одним кадром -
+    # Pillow копирует все кадры во внутренний список до записи GIF,
+    # так что пик памяти по-прежнему пропорционален числу кадров
+    gif_path = os.path.join(_output_dir(), "automata_process.gif")
+    with Image.open(imgs[0]) as first:
+        first.save(gif_path, format='GIF',
+                   append_images=_iter_gif_frames(imgs[1:]),
                    save_all=True,
                    duration=1000, loop=0)
     print(f"✓ GIF создан: {gif_path}")
 
 
-def visualize_regex_processing(regex, test_string=None):
-    """Полная визуализация процесса от регулярного выражения до ДКА"""
+@lru_cache(maxsize=256)
+def _compile_regex(regex):
+    """Регулярное выражение -> (обратная польская запись, НКА, ДКА) с кэшированием"""
     from main import RegexInterpreter
 
     interpreter = RegexInterpreter()
+    postfix = interpreter.to_postfix(regex)
+    nfa = interpreter.build_nfa_from_postfix(postfix)
+    dfa = interpreter.nfa_to_dfa(nfa, regex)
+    return postfix, nfa, dfa
+
 
+def visualize_regex_processing(regex, test_string=None):
+    """Полная визуализация процесса от регулярного выражения до ДКА"""
     try:
+        # Повторная визуализация того же выражения не строит автоматы заново
+        postfix, nfa, dfa = _compile_regex(regex)
+
         # 1. Преобразование в обратную польскую запись
-        postfix = interpreter.to_postfix(regex)
         print(f"✓ Обратная польская запись: {postfix}")
 
         # 2. Построение НКА
         print("Строим НКА...")
-        nfa = interpreter.build_nfa_from_postfix(postfix)
         NFAGraphVisualizer.visualize_nfa(nfa, "nfa_graph")
 
         # 3. Преобразование в ДКА
         print("Преобразуем НКА в ДКА...")
-        dfa = interpreter.nfa_to_dfa(nfa, regex)
         DFAGraphVisualizer.visualize_dfa(dfa, "dfa_graph")
 
         # 4. Тестирование строки (если указана)
         if test_string:
             print(f"\nТестируем строку: '{test_string}'")
-            result = dfa.process_input(test_string)
+            # Один проход по упакованной таблице ДКА дает и результат, и путь
+            result, path = dfa.process_input_with_trace(test_string)
             print(f"Результат: {'✓ ПРИНЯТА' if result else '✗ ОТВЕРГНУТА'}")
 
             # Визуализация пути
             if result:
-                accepted, path = dfa.process_input_with_trace(test_string)
                 print(f"Путь состояний: {' → '.join([f'q{s}' for s in path])}")
 
         create_gif_from_visualizations()
@@ -594,8 +899,8 @@ def interactive_visualization():
             create_gif_from_visualizations()
 
         elif choice == '5':
-            if os.path.exists("visualizations"):
-                files = glob.glob("visualizations/*")
+            if os.path.exists(OUTPUT_DIR):
+                files = glob.glob(os.path.join(OUTPUT_DIR, "*"))
                 for file in files:
                     try:
                         os.remove(file)
@@ -1,50 +1,200 @@
 import sys
 import os
+import hashlib
+import itertools
+import subprocess
+import tempfile
+from functools import lru_cache
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QFileDialog, QHBoxLayout, QVBoxLayout, QPushButton,
-    QLabel, QTreeView, QMessageBox, QFileSystemModel
+    QLabel, QTreeView, QMessageBox, QFileSystemModel, QCheckBox
 )
-from PyQt5.QtGui import QStandardItemModel, QStandardItem
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QThread, pyqtSignal
 
-from xml_parser import parse_xml_file, XMLNode
+from xml_parser import parse_xml_file, parse_xml_file_fast, XMLNode
 from xml_lexer import XMLLexerError, XMLToken
-import graphviz
 
 
-class XMLTreeModel(QStandardItemModel):
+# how often a running dot process is checked for a cancelled render, in seconds
+DOT_POLL_INTERVAL = 0.1
+
+# rendered AST graphs, one PNG per distinct DOM
+GRAPH_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "xmlvis")
+# at most this many PNGs are kept; the least recently used are evicted
+GRAPH_CACHE_MAX_FILES = 64
+
+
+def _dom_hash(root_node: XMLNode) -> str:
+    # content digest of the whole tree in document order; the child count
+    # keeps differently nested trees with the same nodes apart
+    digest = hashlib.blake2b(digest_size=16)
+    stack = [root_node]
+    while stack:
+        node = stack.pop()
+        digest.update(repr((node.kind, node.name, node.text,
+                            tuple(node.attrs.items()), len(node.children))).encode("utf-8"))
+        stack.extend(reversed(node.children))
+    return digest.hexdigest()
+
+
+def _evict_old_graphs():
+    entries = []
+    for entry in os.scandir(GRAPH_CACHE_DIR):
+        if entry.name.endswith(".png"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass  # removed by another render meanwhile
+    entries.sort()
+    for _, path in entries[:-GRAPH_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _dot_quote(text):
+    return '"' + str(text).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+# label formatter per node kind: one dict lookup instead of an if/elif chain
+LABEL_FMT = {
+    "element": lambda payload: f"<{payload}>",
+    "text": lambda payload: f"TEXT: {payload}",
+    "comment": lambda payload: f"COMMENT: {payload}",
+    "cdata": lambda payload: f"CDATA: {payload}",
+}
+
+
+def _unknown_label(payload):
+    return "UNKNOWN"
+
+
+# labels repeat a lot (same tag names, whitespace and boilerplate text), so they are
+# formatted once per distinct value; the caches are bounded for unique-heavy documents
+@lru_cache(maxsize=4096)
+def _label(kind, payload):
+    return LABEL_FMT.get(kind, _unknown_label)(payload)
+
+
+def _node_label(node: XMLNode) -> str:
+    return _label(node.kind, node.name if node.kind == "element" else node.text)
+
+
+@lru_cache(maxsize=4096)
+def _attr_label(k, v, sep="="):
+    return f"@{k}{sep}\"{v}\""
+
+
+class _TreeRow:
+    # one row of the DOM tree view: an XMLNode or, with node=None, an attribute;
+    # internalPointer() of every model index points at one of these
+    __slots__ = ("parent", "row", "node", "label", "children")
+
+    def __init__(self, parent, row, node, label):
+        self.parent = parent
+        self.row = row
+        self.node = node
+        self.label = label
+        self.children = None
+
+
+class XMLTreeModel(QAbstractItemModel):
+    # rows are created per parent on first access; the view asks only for the
+    # rows it shows, so a large DOM costs nothing until it is expanded
     def __init__(self, root_node: XMLNode):
         super().__init__()
-        self.setHorizontalHeaderLabels(["XML DOM Tree"])
-        root_item = self.create_item(root_node)
-        self.invisibleRootItem().appendRow(root_item)
-
-    def create_item(self, node: XMLNode):
-        if node.kind == "element":
-            text = f"<{node.name}>"
-        elif node.kind == "text":
-            text = f"TEXT: {node.text}"
-        elif node.kind == "comment":
-            text = f"COMMENT: {node.text}"
-        elif node.kind == "cdata":
-            text = f"CDATA: {node.text}"
-        else:
-            text = f"UNKNOWN"
-
-        item = QStandardItem(text)
-
-        if node.kind == "element":
-            # attributes as subnodes
-            for k, v in node.attrs.items():
-                a = QStandardItem(f"@{k} = \"{v}\"")
-                item.appendRow(a)
+        self._top = _TreeRow(None, 0, None, None)
+        self._top.children = [_TreeRow(self._top, 0, root_node, _node_label(root_node))]
+
+    def _rows(self, tree_row: _TreeRow):
+        if tree_row.children is None:
+            node = tree_row.node
+            # attributes as subnodes, then children
+            rows = [_TreeRow(tree_row, i, None, _attr_label(k, v, " = "))
+                    for i, (k, v) in enumerate(node.attrs.items())]
+            offset = len(rows)
+            rows.extend(_TreeRow(tree_row, offset + i, ch, _node_label(ch))
+                        for i, ch in enumerate(node.children))
+            tree_row.children = rows
+        return tree_row.children
+
+    def _tree_row(self, index):
+        return index.internalPointer() if index.isValid() else self._top
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self._rows(self._tree_row(parent))[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_row = index.internalPointer().parent
+        if parent_row is self._top:
+            return QModelIndex()
+        return self.createIndex(parent_row.row, 0, parent_row)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        tree_row = self._tree_row(parent)
+        if tree_row is self._top:
+            return 1
+
+        # counted from the node, without creating the rows
+        node = tree_row.node
+        if node is None or node.kind != "element":
+            return 0
+        return len(node.attrs) + len(node.children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return index.internalPointer().label
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "XML DOM Tree"
+        return None
+
+
+class GraphRenderWorker(QThread):
+    # renders the AST graph off the GUI thread; the dot subprocess no longer
+    # freezes the event loop. Scaling happens here too, on QImage (QPixmap is
+    # GUI-thread only): a fast preview first, then the smooth version
+    preview_ready = pyqtSignal(QImage)
+    smooth_ready = pyqtSignal(QImage)
+    failed = pyqtSignal(str)
+
+    def __init__(self, root_node: XMLNode, width: int, height: int, parent=None):
+        super().__init__(parent)
+        self.root_node = root_node
+        self.width = width
+        self.height = height
+
+    def run(self):
+        try:
+            png_path = MainWindow.generate_graph(self.root_node, self.isInterruptionRequested)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
 
-            # children
-            for ch in node.children:
-                item.appendRow(self.create_item(ch))
+        # a newer render was requested meanwhile: this result is stale
+        if not png_path or self.isInterruptionRequested():
+            return
+
+        image = QImage(png_path)
+        self.preview_ready.emit(image.scaled(self.width, self.height,
+                                             Qt.KeepAspectRatio, Qt.FastTransformation))
 
-        return item
+        if not self.isInterruptionRequested():
+            self.smooth_ready.emit(image.scaled(self.width, self.height,
+                                                Qt.KeepAspectRatio, Qt.SmoothTransformation))
 
 
 class MainWindow(QWidget):
@@ -57,6 +207,8 @@ class MainWindow(QWidget):
         # DOM tree
         self.tree = QTreeView()
         self.tree.setHeaderHidden(False)
+        # all rows are one text line: the view need not measure each row
+        self.tree.setUniformRowHeights(True)
 
         # AST image
         self.label_graph = QLabel("AST Graph will appear here")
@@ -72,8 +224,15 @@ class MainWindow(QWidget):
         self.btn_graph = QPushButton("Show AST Graph")
         self.btn_graph.clicked.connect(self.show_graph)
 
+        # ElementTree's C parser instead of the custom lexer/parser
+        self.chk_fast = QCheckBox("Fast parse (ElementTree)")
+
         self.xml_path = None
         self.dom_root = None
+        self._graph_worker = None
+        # every worker that has not finished yet, superseded ones included:
+        # all of them must be waited for before the window goes away
+        self._graph_workers = set()
 
         # Layout
         left = QVBoxLayout()
@@ -90,6 +249,7 @@ class MainWindow(QWidget):
         buttons.addWidget(self.btn_load)
         buttons.addWidget(self.btn_parse)
         buttons.addWidget(self.btn_graph)
+        buttons.addWidget(self.chk_fast)
 
         main = QVBoxLayout()
         main.addLayout(h, 1)
@@ -116,7 +276,8 @@ class MainWindow(QWidget):
             return
 
         try:
-            self.dom_root = parse_xml_file(self.xml_path)
+            parse = parse_xml_file_fast if self.chk_fast.isChecked() else parse_xml_file
+            self.dom_root = parse(self.xml_path)
         except Exception as e:
             QMessageBox.critical(self, "Parsing Error", str(e))
             return
@@ -133,58 +294,142 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Error", "Parse XML first.")
             return
 
-        png_path = self.generate_graph(self.dom_root)
-        pixmap = QPixmap(png_path).scaled(
-            self.label_graph.width(),
-            self.label_graph.height(),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
-        self.label_graph.setPixmap(pixmap)
+        # only the latest request matters: ask running renders to stop
+        for running in self._graph_workers:
+            running.requestInterruption()
+
+        worker = GraphRenderWorker(self.dom_root, self.label_graph.width(), self.label_graph.height(), self)
+        worker.preview_ready.connect(self._show_graph_preview)
+        worker.smooth_ready.connect(self._show_smooth_graph)
+        worker.failed.connect(self._graph_failed)
+        worker.finished.connect(self._graph_worker_finished)
+        worker.finished.connect(worker.deleteLater)
+        self._graph_worker = worker
+        self._graph_workers.add(worker)
+
+        self.label_graph.setText("Rendering AST graph...")
+        worker.start()
+
+    def _graph_worker_finished(self):
+        worker = self.sender()
+        self._graph_workers.discard(worker)
+        if worker is self._graph_worker:
+            self._graph_worker = None
+
+    def _graph_failed(self, message):
+        if self.sender() is self._graph_worker:
+            QMessageBox.critical(self, "Graph Error", message)
+
+    def _show_graph_preview(self, image):
+        if self.sender() is self._graph_worker:
+            self.label_graph.setPixmap(QPixmap.fromImage(image))
+
+    def _show_smooth_graph(self, image):
+        # the smooth picture replaces the preview as soon as it is ready
+        if self.sender() is self._graph_worker:
+            self.label_graph.setPixmap(QPixmap.fromImage(image))
+
+    def closeEvent(self, event):
+        # a QThread must not be destroyed while running: stop them all first,
+        # then wait for each one (a killed dot process returns quickly)
+        workers = list(self._graph_workers)
+        for worker in workers:
+            worker.requestInterruption()
+        for worker in workers:
+            worker.wait()
+        super().closeEvent(event)
 
 
     # GENERATE GRAPHVIZ AST
 
-    def generate_graph(self, root_node):
-        dot = graphviz.Digraph("XML_AST")
-        dot.attr(rankdir="TB", fontsize="12")
-
-        def add(node, parent_id=None):
-            nid = str(id(node))
-
-            if node.kind == "element":
-                label = f"<{node.name}>"
-            elif node.kind == "text":
-                label = f"TEXT: {node.text}"
-            elif node.kind == "comment":
-                label = f"COMMENT: {node.text}"
-            elif node.kind == "cdata":
-                label = f"CDATA: {node.text}"
-            else:
-                label = "UNKNOWN"
-
-            dot.node(nid, label)
+    @staticmethod
+    def generate_graph(root_node, should_stop=None):
+        # the same DOM always renders to the same picture: reuse the PNG
+        # instead of running dot again
+        out = os.path.join(GRAPH_CACHE_DIR, _dom_hash(root_node) + ".png")
+        try:
+            # a hit also refreshes the mtime, which eviction goes by
+            os.utime(out)
+            return out
+        except OSError:
+            pass
+
+        # DOT source is assembled as text: one node buffer and one edge buffer,
+        # joined once, instead of a Digraph.node/edge call per element
+        nodes_src = []
+        edges_src = []
+        # short sequential IDs (n0, n1, ...) instead of 16-digit id() values;
+        # every node is visited once, so a counter is enough
+        counter = itertools.count()
+
+        # explicit stack instead of recursion; children are pushed in reverse
+        # so nodes are emitted in document (pre-)order as before
+        stack = [(root_node, None)]
+        while stack:
+            # checked per node so a superseded render stops early
+            if should_stop is not None and should_stop():
+                return None
+
+            node, parent_id = stack.pop()
+            nid = f"n{next(counter)}"
+
+            nodes_src.append(f"\t{nid} [label={_dot_quote(_node_label(node))}]")
 
             if parent_id:
-                dot.edge(parent_id, nid)
+                edges_src.append(f"\t{parent_id} -> {nid}")
 
             # attributes as child nodes
             if node.kind == "element":
                 for k, v in node.attrs.items():
-                    aid = f"{nid}-{k}"
-                    dot.node(aid, f"@{k}=\"{v}\"", shape="box")
-                    dot.edge(nid, aid)
+                    aid = _dot_quote(f"{nid}-{k}")
+                    attr_label = _dot_quote(_attr_label(k, v))
+                    nodes_src.append(f"\t{aid} [label={attr_label} shape=box]")
+                    edges_src.append(f"\t{nid} -> {aid}")
 
             # children
-            for ch in node.children:
-                add(ch, nid)
-
-        add(root_node)
-        out = dot.render("xml_ast", format="png", cleanup=True)
+            for ch in reversed(node.children):
+                stack.append((ch, nid))
+
+        src = ("digraph XML_AST {\n\tgraph [rankdir=TB fontsize=12]\n"
+               + "\n".join(nodes_src) + "\n" + "\n".join(edges_src) + "\n}\n")
+        # the source is piped to dot over stdin: no temporary .gv file to write
+        # and unlink. The PNG is written only after dot succeeded, so a failed
+        # run never leaves a broken picture in the cache
+        proc = subprocess.Popen(["dot", "-Tpng"], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        data = src.encode("utf-8")
+        while True:
+            try:
+                png, err = proc.communicate(data, timeout=DOT_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                # input is sent by the first call only; later calls just wait
+                data = None
+            # dot is the slow part: a superseded render kills it instead of
+            # letting it finish
+            if should_stop is not None and should_stop():
+                proc.kill()
+                proc.communicate()
+                return None
+        if proc.returncode != 0:
+            raise RuntimeError(err.decode("utf-8", "replace").strip()
+                               or f"dot exited with code {proc.returncode}")
+
+        # written to a temp file and renamed into place: a concurrent render of
+        # the same DOM or a crash mid-write never exposes a partial PNG
+        os.makedirs(GRAPH_CACHE_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=GRAPH_CACHE_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            os.replace(tmp, out)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        _evict_old_graphs()
         return out
 
 
-
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     w = MainWindow()
@@ -0,0 +1,77 @@
+import unittest
+import tempfile
+import os
+from xml_parser import XMLParserError, parse_xml_file, parse_xml_file_fast, read_xml_text
+
+
+TEST_XML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.xml")
+
+
+def _normalize(node):
+    """Дерево в виде кортежей; CDATA в быстром режиме становится текстом"""
+    kind = "text" if node.kind == "cdata" else node.kind
+    return kind, node.name, node.text, node.attrs, [_normalize(ch) for ch in node.children]
+
+
+class TestXMLParser(unittest.TestCase):
+
+    def _write(self, data, mode="w"):
+        """Временный файл с заданным содержимым, удаляется после теста"""
+        kwargs = {} if "b" in mode else {"encoding": "utf-8", "newline": ""}
+        with tempfile.NamedTemporaryFile(mode, suffix=".xml", delete=False, **kwargs) as f:
+            f.write(data)
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def test_fast_parser_matches_custom(self):
+        """Быстрый и собственный парсер строят одинаковые деревья для test.xml"""
+        custom = parse_xml_file(TEST_XML)
+        fast = parse_xml_file_fast(TEST_XML)
+
+        self.assertEqual(len(custom.children), len(fast.children))
+        for a, b in zip(custom.children, fast.children):
+            if a.name == "entities":
+                # числовые ссылки раскрывает только ElementTree
+                self.assertEqual(a.children[0].text, "& < > ' \" &#65; &#x41;")
+                self.assertEqual(b.children[0].text, "& < > ' \" A A")
+                continue
+            with self.subTest(element=a.name):
+                self.assertEqual(_normalize(a), _normalize(b))
+
+        # CDATA сохраняется собственным парсером и сливается с текстом в быстром
+        description = custom.children[0].children[-1]
+        self.assertEqual(description.children[0].kind, "cdata")
+        fast_description = fast.children[0].children[-1]
+        self.assertEqual(fast_description.children[0].kind, "text")
+
+    def test_comments_and_pi_kept(self):
+        """Комментарии и инструкции обработки остаются дочерними узлами"""
+        path = self._write("<r><!--c--><?pi data?><a/></r>")
+
+        for parse in (parse_xml_file, parse_xml_file_fast):
+            with self.subTest(parser=parse.__name__):
+                root = parse(path)
+                self.assertEqual([(ch.kind, ch.text) for ch in root.children],
+                                 [("comment", "c"), ("pi", "pi data"), ("element", None)])
+
+    def test_read_empty_file(self):
+        """Пустой файл читается как пустая строка"""
+        self.assertEqual(read_xml_text(self._write(b"", "wb")), "")
+
+    def test_read_normalizes_newlines(self):
+        """Переводы строк \\r\\n и \\r приводятся к \\n"""
+        path = self._write("<a>\r\n<b/>\r</a>\r\n".encode("utf-8"), "wb")
+        self.assertEqual(read_xml_text(path), "<a>\n<b/>\n</a>\n")
+
+    def test_malformed_raises(self):
+        """Некорректный XML дает XMLParserError в обоих режимах"""
+        for data in ("<a></b>", "<a>", ""):
+            path = self._write(data)
+            for parse in (parse_xml_file, parse_xml_file_fast):
+                with self.subTest(data=data, parser=parse.__name__):
+                    with self.assertRaises(XMLParserError):
+                        parse(path)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,6 +1,33 @@
 import json
 import os
+import re
+from collections import Counter
+from functools import lru_cache
 from xml_lexer import XMLLexer, create_xml_example
+from xml_parser import read_xml_text
+
+# Подсветка разметки: все конструкции ищутся одним регулярным выражением за проход.
+# Длинные варианты стоят раньше одиночных '<' и '>', чтобы '<!--' не разбивался на части
+HIGHLIGHT_RE = re.compile(r'<!--|-->|<\?|\?>|</|<|>')
+COLOR_MAP = {
+    '<': '\033[91m', '>': '\033[91m', '</': '\033[91m',  # Красный
+    '<!--': '\033[92m', '-->': '\033[92m',  # Зеленый
+    '<?': '\033[93m', '?>': '\033[93m',  # Желтый
+}
+RESET = '\033[0m'
+
+
+def _highlight_match(match):
+    """Раскраска одного найденного фрагмента разметки"""
+    text = match.group()
+    return COLOR_MAP[text] + text + RESET
+
+
+@lru_cache(maxsize=2048)
+def _colorize(line):
+    """Подсветка одной строки; одинаковые строки (закрывающие теги,
+    пустые строки с отступом) раскрашиваются один раз"""
+    return HIGHLIGHT_RE.sub(_highlight_match, line)
 
 
 class SimpleVisualizer:
@@ -34,14 +61,7 @@ class SimpleVisualizer:
         lines = xml.split('\n')
         for i, line in enumerate(lines[:max_lines], 1):
             # Простая подсветка
-            line_highlighted = line
-            line_highlighted = line_highlighted.replace('<', '\033[91m<\033[0m')  # Красный
-            line_highlighted = line_highlighted.replace('>', '\033[91m>\033[0m')  # Красный
-            line_highlighted = line_highlighted.replace('</', '\033[91m</\033[0m')  # Красный
-            line_highlighted = line_highlighted.replace('<!--', '\033[92m<!--\033[0m')  # Зеленый
-            line_highlighted = line_highlighted.replace('-->', '\033[92m-->\033[0m')  # Зеленый
-            line_highlighted = line_highlighted.replace('<?', '\033[93m<?\033[0m')  # Желтый
-            line_highlighted = line_highlighted.replace('?>', '\033[93m?>\033[0m')  # Желтый
+            line_highlighted = _colorize(line)
 
             print(f"{i:3}: {line_highlighted}")
 
@@ -74,36 +94,39 @@ class SimpleVisualizer:
 
     def create_text_report(self, xml, tokens, stats, structure, filename="xml_analysis_report.txt"):
         """Создание текстового отчета"""
-        report = "=" * 80 + "\n"
-        report += "ОТЧЕТ ОБ АНАЛИЗЕ XML\n"
-        report += "=" * 80 + "\n\n"
-
-        report += "Статистика:\n"
-        report += f"  Всего токенов: {stats['total_tokens']}\n"
-        report += f"  Ошибок: {stats['errors']}\n"
-        report += f"  Строк обработано: {stats['lines_processed']}\n"
-        report += f"  Корректность XML: {'ДА' if structure['well_formed'] else 'НЕТ'}\n\n"
-
-        report += "Типы токенов:\n"
+        # Отчет собирается списком строк и склеивается один раз в конце:
+        # без квадратичного копирования растущей строки при +=
+        report = ["=" * 80 + "\n",
+                  "ОТЧЕТ ОБ АНАЛИЗЕ XML\n",
+                  "=" * 80 + "\n\n"]
+        add = report.append
+
+        add("Статистика:\n")
+        add(f"  Всего токенов: {stats['total_tokens']}\n")
+        add(f"  Ошибок: {stats['errors']}\n")
+        add(f"  Строк обработано: {stats['lines_processed']}\n")
+        add(f"  Корректность XML: {'ДА' if structure['well_formed'] else 'НЕТ'}\n\n")
+
+        add("Типы токенов:\n")
         for token_type, count in stats['token_types'].items():
-            report += f"  {token_type}: {count}\n"
+            add(f"  {token_type}: {count}\n")
 
-        report += "\nСтруктура XML:\n"
-        report += f"  Тегов: {len(structure['tags'])}\n"
-        report += f"  Атрибутов: {len(structure['attributes'])}\n"
-        report += f"  Текстовых узлов: {len(structure['text_nodes'])}\n"
-        report += f"  Комментариев: {len(structure['comments'])}\n"
+        add("\nСтруктура XML:\n")
+        add(f"  Тегов: {len(structure['tags'])}\n")
+        add(f"  Атрибутов: {len(structure['attributes'])}\n")
+        add(f"  Текстовых узлов: {len(structure['text_nodes'])}\n")
+        add(f"  Комментариев: {len(structure['comments'])}\n")
 
-        report += "\nПервые 20 токенов:\n"
+        add("\nПервые 20 токенов:\n")
         for i, token in enumerate(tokens[:20], 1):
             value = str(token['value'])
             if len(value) > 50:
                 value = value[:47] + "..."
-            report += f"  {i:3}. {token['type']:20} = '{value}' (строка {token['lineno']})\n"
+            add(f"  {i:3}. {token['type']:20} = '{value}' (строка {token['lineno']})\n")
 
         # Сохраняем отчет
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write(report)
+            f.write("".join(report))
 
         print(f"Текстовый отчет сохранен в {filename}")
         return filename
@@ -159,13 +182,8 @@ def visualize_state_transitions(lexer):
     for transition, position in state_history:
         print(f"{transition:<30} {position:>10}")
 
-    # Статистика по состояниям
-    state_counts = {}
-    for transition, _ in state_history:
-        state = transition.split()[0]
-        if state not in state_counts:
-            state_counts[state] = 0
-        state_counts[state] += 1
+    # Статистика по состояниям: подсчет в Counter вместо ручного словаря
+    state_counts = Counter(transition.split()[0] for transition, _ in state_history)
 
     print(f"\nСтатистика по состояниям:")
     for state, count in state_counts.items():
@@ -197,8 +215,7 @@ def main():
             filename = input("Введите имя файла: ").strip()
             if os.path.exists(filename):
                 try:
-                    with open(filename, 'r', encoding='utf-8') as f:
-                        xml = f.read()
+                    xml = read_xml_text(filename)
                     analyze_and_visualize(xml, visualizer, f"Файл: {filename}")
                 except Exception as e:
                     print(f"Ошибка чтения файла: {e}")
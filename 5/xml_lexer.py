@@ -1,15 +1,34 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from dataclasses import dataclass
+import re
 from typing import Any, Dict, List, Optional
 
+# символы, меняющие состояние разбора DOCTYPE: кавычки, скобки subset и '>'
+_DOCTYPE_SPECIAL = re.compile(r"[\"'\[\]>]")
+# хвост имени (str.isalnum() или "_.:-") и пробельные символы (str.isspace())
+# снимаются одним совпадением регулярного выражения, а не циклом по символам
+_NAME_TAIL = re.compile(r"[\w.:-]*")
+_WS = re.compile(r"\s*")
+
 
-@dataclass
 class XMLToken:
-    type: str
-    value: Any = None
-    pos: int = 0
+    # a token stream holds one object per token: __slots__ keeps each one a
+    # fixed three-field record instead of an instance with its own __dict__
+    # (dataclass(slots=True) needs Python 3.10)
+    __slots__ = ("type", "value", "pos")
+
+    def __init__(self, type: str, value: Any = None, pos: int = 0):
+        self.type = type
+        self.value = value
+        self.pos = pos
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.type, self.value, self.pos) == (other.type, other.value, other.pos)
+
+    __hash__ = None  # mutable, compared by value
 
     def __repr__(self) -> str:
         if self.value is None:
@@ -51,8 +70,7 @@ class XMLLexer:
         self.i += k
 
     def _skip_ws(self) -> None:
-        while (c := self._peek()) is not None and c.isspace():
-            self._advance()
+        self.i = _WS.match(self.text, self.i).end()
 
     def _read_until(self, needle: str) -> str:
         j = self.text.find(needle, self.i)
@@ -63,6 +81,9 @@ class XMLLexer:
         return s
 
     def _unescape(self, s: str) -> str:
+        # без '&' сущностей быть не может - пропускаем пять проходов replace
+        if "&" not in s:
+            return s
         for ent, repl in self.ENTITY_MAP.items():
             s = s.replace(ent, repl)
         return s
@@ -74,9 +95,7 @@ class XMLLexer:
         if not (c.isalpha() or c in "_:"):
             self._error("Tag name expected")
         start = self.i
-        self._advance()
-        while (c := self._peek()) is not None and (c.isalnum() or c in "_.:-"):
-            self._advance()
+        self.i = _NAME_TAIL.match(self.text, start + 1).end()
         return self.text[start:self.i]
 
     def _read_quoted_value(self) -> str:
@@ -84,22 +103,23 @@ class XMLLexer:
         if q not in ("'", '"'):
             self._error("Attribute value must be quoted")
         self._advance()
-        start = self.i
-        while True:
-            c = self._peek()
-            if c is None:
-                self._error("Unclosed attribute value")
-            if c == q:
-                val = self.text[start:self.i]
-                self._advance()
-                return self._unescape(val)
-            self._advance()
+        # закрывающая кавычка ищется за один вызов str.find, а не посимвольно
+        j = self.text.find(q, self.i)
+        if j == -1:
+            self.i = self.n
+            self._error("Unclosed attribute value")
+        val = self.text[self.i:j]
+        self.i = j + 1
+        return self._unescape(val)
 
     def _read_text_node(self) -> str:
-        start = self.i
-        while (c := self._peek()) is not None and c != "<":
-            self._advance()
-        return self._unescape(self.text[start:self.i])
+        # текст тянется до ближайшего '<' или до конца входа
+        j = self.text.find("<", self.i)
+        if j == -1:
+            j = self.n
+        s = self.text[self.i:j]
+        self.i = j
+        return self._unescape(s)
 
     def _read_doctype(self) -> str:
         # now at "<!DOCTYPE"
@@ -107,42 +127,31 @@ class XMLLexer:
         self._advance(len("<!DOCTYPE"))
 
         bracket_depth = 0
-        in_quote: Optional[str] = None
         buf_start = self.i
+        text = self.text
 
         while True:
-            c = self._peek()
-            if c is None:
+            # прыгаем сразу к следующему значимому символу вместо посимвольного обхода
+            m = _DOCTYPE_SPECIAL.search(text, self.i)
+            if m is None:
                 self.i = start_pos
                 self._error("Unclosed DOCTYPE")
-
-            if in_quote:
-                if c == in_quote:
-                    in_quote = None
-                self._advance()
-                continue
+            c = m.group()
+            self.i = m.end()
 
             if c in ("'", '"'):
-                in_quote = c
-                self._advance()
-                continue
-
-            if c == "[":
+                j = text.find(c, self.i)
+                if j == -1:
+                    self.i = start_pos
+                    self._error("Unclosed DOCTYPE")
+                self.i = j + 1
+            elif c == "[":
                 bracket_depth += 1
-                self._advance()
-                continue
-
-            if c == "]" and bracket_depth > 0:
-                bracket_depth -= 1
-                self._advance()
-                continue
-
-            if c == ">" and bracket_depth == 0:
-                inner = self.text[buf_start:self.i].strip()
-                self._advance()  # consume '>'
-                return inner
-
-            self._advance()
+            elif c == "]":
+                if bracket_depth > 0:
+                    bracket_depth -= 1
+            elif bracket_depth == 0:  # '>'
+                return text[buf_start:self.i - 1].strip()
 
     def tokenize(self) -> List[XMLToken]:
         tokens: List[XMLToken] = []
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import mmap
+import os
+import xml.etree.ElementTree as ET
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
 from xml_lexer import XMLLexer, XMLLexerError, XMLToken
 
+# буфер чтения для потокового разбора: iterparse запрашивает по 16 КиБ,
+# а с буфером в 1 МиБ системный вызов read приходится на 64 таких запроса
+READ_BUFFER_SIZE = 1 << 20
+
 
 class XMLParserError(Exception):
     pass
@@ -44,7 +51,8 @@ class _Parser:
             if tok.type in ("PROLOG", "DOCTYPE", "PI", "COMMENT", "DECL"):
                 self.k += 1
                 continue
-            if tok.type == "TEXT" and str(tok.value or "").strip() == "":
+            # isspace проверяет строку на месте, без обрезанной копии, которую создает strip()
+            if tok.type == "TEXT" and (not tok.value or str(tok.value).isspace()):
                 self.k += 1
                 continue
             break
@@ -82,7 +90,7 @@ class _Parser:
             if tok.type == "TEXT":
                 self.k += 1
                 txt = str(tok.value or "")
-                if txt.strip() != "":
+                if txt and not txt.isspace():
                     node.children.append(XMLNode("text", text=txt))
                 continue
 
@@ -132,6 +140,55 @@ def parse_xml_string(text: str) -> XMLNode:
     return _Parser(tokens).parse_document()
 
 
+def read_xml_text(path: str) -> str:
+    # файл отображается в память и декодируется прямо из отображения:
+    # без промежуточной копии байтов в буфере чтения
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = str(mm, "utf-8")
+
+    # те же переводы строк, что дает чтение в текстовом режиме
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
 def parse_xml_file(path: str) -> XMLNode:
-    with open(path, "r", encoding="utf-8") as f:
-        return parse_xml_string(f.read())
+    return parse_xml_string(read_xml_text(path))
+
+
+def parse_xml_file_fast(path: str) -> XMLNode:
+    # быстрый режим: DOM строится по событиям C-парсера ElementTree.
+    # CDATA сливается с текстом, а имена с пространствами имен раскрываются в {uri}local
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True, insert_pis=True))
+    nodes: Dict[int, XMLNode] = {}
+    elem = None
+
+    try:
+        with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+            for _, elem in ET.iterparse(f, events=("end",), parser=parser):
+                node = XMLNode("element", name=elem.tag, attrs=dict(elem.attrib))
+                if elem.text and not elem.text.isspace():
+                    node.children.append(XMLNode("text", text=elem.text))
+
+                for child in elem:
+                    if child.tag is ET.Comment:
+                        node.children.append(XMLNode("comment", text=child.text))
+                    elif child.tag is ET.ProcessingInstruction:
+                        node.children.append(XMLNode("pi", text=child.text))
+                    else:
+                        node.children.append(nodes.pop(id(child)))
+                    if child.tail and not child.tail.isspace():
+                        node.children.append(XMLNode("text", text=child.tail))
+
+                nodes[id(elem)] = node
+                # дочерние элементы уже переведены в XMLNode - освобождаем их
+                del elem[:]
+    except ET.ParseError as e:
+        raise XMLParserError(f"Parser error: {e}") from e
+
+    if elem is None:
+        raise XMLParserError("Expected element start, got EOF")
+    return nodes[id(elem)]